@@ -0,0 +1,147 @@
+"""Measure emergency alert delivery throughput against a local SMTP server.
+
+Starts an aiosmtpd server on localhost (``pip install aiosmtpd``), then
+delivers the same burst of alerts in several ways and prints, as JSON, the
+time until the last message was accepted, messages per second and how many
+SMTP connections the server saw:
+
+- per_message: one connection per alert, sent serially (the old behaviour)
+- pooled: AlertDispatcher with 1..N reused connections
+- digest: AlertDispatcher folding 3rd degree alerts into digest messages
+
+--connect-delay-ms adds latency to every EHLO to stand in for the TLS
+handshake and round trips of a remote server; --message-delay-ms delays
+every accepted message.
+
+Usage:
+    python benchmarks/alert_throughput.py --alerts 200 --pool-sizes 1,2,4 --connect-delay-ms 150
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.alert_service import AlertDispatcher, SMTPConnectionPool, Alert, build_alert_message  # noqa: E402
+
+
+class CountingHandler:
+    def __init__(self, connect_delay, message_delay):
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.connections = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.message_delay)
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+
+def make_alerts(count, image_bytes):
+    import io
+    import numpy as np
+    from PIL import Image
+    side = max(16, int((image_bytes / 1.5) ** 0.5))  # Noise JPEGs take roughly 1.5 bytes per pixel
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(0).integers(0, 255, (side, side, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    classes = ["1st degree burn", "2nd degree burn", "3rd degree burn"]
+    # Distinct trailing bytes so deduplication does not hide any work
+    return [
+        (classes[index % len(classes)], 0.9, buffer.getvalue() + os.urandom(16), f"alert-{index}.jpg")
+        for index in range(count)
+    ]
+
+
+async def run_per_message(alerts, port):
+    import aiosmtplib
+    start = time.perf_counter()
+    for predicted_class, confidence, image_data, image_name in alerts:
+        message = build_alert_message([Alert(predicted_class, confidence, image_data, image_name)])
+        await aiosmtplib.send(message, hostname="127.0.0.1", port=port, start_tls=False)
+    return time.perf_counter() - start
+
+
+async def run_dispatcher(alerts, port, pool_size, digest_seconds=0.0):
+    dispatcher = AlertDispatcher(
+        transport=SMTPConnectionPool(hostname="127.0.0.1", port=port, username="", password="", size=pool_size),
+        max_queued=len(alerts) + 1,
+        dedupe_seconds=0,
+        digest_seconds=digest_seconds,
+        backoff_seconds=0.1,
+    )
+    start = time.perf_counter()
+    for alert in alerts:
+        dispatcher.submit(*alert)
+    await dispatcher.drain()
+    elapsed = time.perf_counter() - start
+    stats = dispatcher.stats()
+    await dispatcher.stop()
+    return elapsed, stats
+
+
+async def main(args):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("This benchmark needs aiosmtpd: pip install aiosmtpd")
+    handler = CountingHandler(args.connect_delay_ms / 1000, args.message_delay_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    alerts = make_alerts(args.alerts, args.image_bytes)
+    results = []
+
+    async def measure(name, coroutine, **extra):
+        connections, messages = handler.connections, handler.messages
+        outcome = await coroutine
+        elapsed, stats = outcome if isinstance(outcome, tuple) else (outcome, None)
+        result = {
+            "mode": name,
+            **extra,
+            "alerts": len(alerts),
+            "seconds": elapsed,
+            "alerts_per_second": len(alerts) / elapsed,
+            "messages": handler.messages - messages,
+            "connections": handler.connections - connections,
+        }
+        if stats is not None:
+            result["failed_messages"] = stats["failed_messages"]
+            result["retries"] = stats["retries"]
+        results.append(result)
+
+    try:
+        if not args.skip_per_message:
+            await measure("per_message", run_per_message(alerts, controller.port))
+        for pool_size in args.pool_sizes:
+            await measure("pooled", run_dispatcher(alerts, controller.port, pool_size), pool_size=pool_size)
+        await measure("digest", run_dispatcher(alerts, controller.port, max(args.pool_sizes), args.digest_seconds),
+                      pool_size=max(args.pool_sizes), digest_seconds=args.digest_seconds)
+    finally:
+        controller.stop()
+    print(json.dumps(results, indent=2))
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=200)
+    parser.add_argument("--image-bytes", type=int, default=50_000, help="Size of the attached image per alert")
+    parser.add_argument("--pool-sizes", type=int_list, default=[1, 2, 4])
+    parser.add_argument("--digest-seconds", type=float, default=0.05)
+    parser.add_argument("--connect-delay-ms", type=float, default=100.0)
+    parser.add_argument("--message-delay-ms", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--skip-per-message", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""Compare two result files from micro.py or load.py and flag regressions.
+
+For every measurement present in both runs, prints the baseline and
+candidate p50/p95/p99 and throughput with their ratios, as JSON. A
+measurement regressed when a percentile got more than --threshold slower
+or throughput dropped by more than --threshold. With --fail-on-regression
+the exit code is 1 if anything regressed, so a CI job can gate on it.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json --threshold 0.10
+"""
+import sys
+import json
+import argparse
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_KEYS = ("throughput_per_second", "items_per_second")
+
+
+def flatten(results, prefix=""):
+    """Map "group/name" to each measurement dict (one that has a count) in a results tree."""
+    measurements = {}
+    for name, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        if "count" in value:
+            measurements[prefix + name] = value
+        else:
+            measurements.update(flatten(value, f"{prefix}{name}/"))
+    return measurements
+
+
+def compare(baseline, candidate, threshold):
+    rows, regressions = [], []
+    baseline, candidate = flatten(baseline["results"]), flatten(candidate["results"])
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name], candidate[name]
+        row = {"name": name}
+        regressed = False
+        for key in LATENCY_KEYS + THROUGHPUT_KEYS:
+            if not before.get(key) or after.get(key) is None:
+                continue
+            ratio = after[key] / before[key]
+            row[key] = {"baseline": before[key], "candidate": after[key], "ratio": ratio}
+            if key in LATENCY_KEYS and ratio > 1 + threshold:
+                regressed = True
+            if key in THROUGHPUT_KEYS and ratio < 1 - threshold:
+                regressed = True
+        row["regressed"] = regressed
+        rows.append(row)
+        if regressed:
+            regressions.append(name)
+    return {
+        "threshold": threshold,
+        "only_in_baseline": sorted(baseline.keys() - candidate.keys()),
+        "only_in_candidate": sorted(candidate.keys() - baseline.keys()),
+        "regressions": regressions,
+        "measurements": rows,
+    }
+
+
+def main(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    report = compare(baseline, candidate, args.threshold)
+    report["baseline"] = baseline.get("metadata", {}).get("commit")
+    report["candidate"] = candidate.get("metadata", {}).get("commit")
+    print(json.dumps(report, indent=2))
+    if args.fail_on_regression and report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""Load-test classification persistence under different connection pool settings.
+
+For every pool size / max overflow combination, runs concurrent writers
+issuing the same multi-row INSERTs as the classification write buffer
+(plus an optional share of history reads) and prints, as JSON, the
+throughput, latency percentiles and pool checkout wait for each setting.
+Pick the smallest pool whose wait_ms stays near zero at your concurrency.
+
+Usage (against the database configured through DB_* / DATABASE_URL):
+    python benchmarks/db_pool_load.py --pool-sizes 5,10,20 --max-overflow 0,10 \\
+        --concurrency 32 --duration 15
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import database  # noqa: E402
+from standins import percentiles  # noqa: E402
+
+BENCH_USERNAME = "db-pool-benchmark"
+
+
+async def bench_user_id():
+    user = await database.get_user(BENCH_USERNAME)
+    if user is None:
+        user = await database.create_user(BENCH_USERNAME, "not-a-real-hash")
+    return user.id
+
+
+async def run_setting(user_id, pool_size, max_overflow, args):
+    await database.configure_engine(pool_size=pool_size, max_overflow=max_overflow)
+    write_latencies, read_latencies, errors = [], [], 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(index):
+        nonlocal errors
+        iteration = 0
+        while time.perf_counter() < deadline:
+            iteration += 1
+            is_read = args.read_every and iteration % args.read_every == 0
+            start = time.perf_counter()
+            try:
+                if is_read:
+                    await database.get_user_classifications(user_id, limit=100)
+                else:
+                    await database.add_classifications([
+                        {
+                            "user_id": user_id,
+                            "image_name": f"bench-{index}-{iteration}-{row}.jpg",
+                            "predicted_class": "2nd degree burn",
+                            "confidence": 0.9,
+                            "timestamp": datetime.utcnow(),
+                        }
+                        for row in range(args.rows_per_write)
+                    ])
+            except Exception:
+                errors += 1
+                continue
+            (read_latencies if is_read else write_latencies).append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(index) for index in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "concurrency": args.concurrency,
+        "rows_per_second": len(write_latencies) * args.rows_per_write / elapsed,
+        "writes": percentiles(write_latencies),
+        "reads": percentiles(read_latencies),
+        "errors": errors,
+        "pool": database.get_pool_stats(),
+    }
+
+
+async def main(args):
+    user_id = await bench_user_id()
+    results = []
+    for pool_size in args.pool_sizes:
+        for max_overflow in args.max_overflow:
+            results.append(await run_setting(user_id, pool_size, max_overflow, args))
+    await database.engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=int_list, default=[5, 10, 20])
+    parser.add_argument("--max-overflow", type=int_list, default=[0, 10])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per pool setting")
+    parser.add_argument("--rows-per-write", type=int, default=50)
+    parser.add_argument("--read-every", type=int, default=5, help="Every Nth operation is a history read (0 = writes only)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""Measure how long `import main` takes and which modules dominate it.
+
+Runs the import in a fresh interpreter with ``-X importtime`` and prints the
+wall time plus the slowest modules it imports (cumulative) as JSON. Run it on
+two commits to compare API start-up cost before and after a change.
+
+Usage:
+    python benchmarks/import_time.py --module main --top 15
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module, runs):
+    wall_times, last_stderr = [], ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_DIR, capture_output=True, text=True,
+        )
+        wall_times.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise SystemExit(f"import {module} failed:\n{completed.stderr[-2000:]}")
+        last_stderr = completed.stderr
+    return wall_times, last_stderr
+
+
+def direct_imports(importtime_output, top):
+    modules = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Each nesting level is indented by two more spaces; keep the modules
+        # imported directly while importing the target, which add up to its total
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth != 1:
+            continue
+        modules.append({
+            "module": name.strip(),
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "self_ms": int(self_us) / 1000,
+        })
+    return sorted(modules, key=lambda item: item["cumulative_ms"], reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    wall_times, output = measure(args.module, args.runs)
+    print(json.dumps({
+        "module": args.module,
+        "runs": args.runs,
+        "wall_ms_min": min(wall_times) * 1000,
+        "wall_ms_max": max(wall_times) * 1000,
+        "slowest_imports": direct_imports(output, args.top),
+    }, indent=2))
@@ -0,0 +1,181 @@
+"""End-to-end load test of /predict and /classifications with configurable concurrency.
+
+By default the API is started in a subprocess on the local stand-ins from
+standins.py (tiny random Keras model, SQLite or --database-url, and an SMTP
+sink receiving the alerts for --alert-classes), so the whole request path
+runs offline: upload, auth, decode, inference, the write-behind buffer and
+alert delivery. Pass --url to load an API that is already running instead.
+
+For each --concurrency level, clients post images to /predict and then read
+/classifications/{user_id} for --duration seconds each. Every upload gets
+distinct trailing bytes so the prediction cache never answers it, unless
+--repeat-images is set. Results (throughput, p50/p95/p99, status codes and
+the server's own stats at the end) are printed as JSON.
+
+Usage:
+    python benchmarks/load.py --concurrency 1,4,16 --duration 20 --output load.json
+    python benchmarks/load.py --url http://localhost:8000 --username demo --password demo
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+
+import httpx
+
+import standins
+
+
+async def run_phase(client, concurrency, duration, request):
+    """Call ``request(client, worker, iteration)`` from ``concurrency`` workers for ``duration`` seconds."""
+    latencies, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        iteration = 0
+        while time.perf_counter() < deadline:
+            iteration += 1
+            start = time.perf_counter()
+            try:
+                response = await request(client, index, iteration)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            statuses[str(response.status_code)] += 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(index) for index in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    return {**standins.summarize(latencies, elapsed, errors), "statuses": dict(statuses)}
+
+
+async def wait_until_ready(client, timeout, server=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"API exited during startup with code {server.returncode}")
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"API was not ready after {timeout:.0f}s")
+
+
+async def sign_in(client, username, password, register):
+    if register:
+        (await client.post("/register", json={"username": username, "password": password})).raise_for_status()
+    response = await client.post("/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    login = response.json()
+    return login["access_token"], login["user_id"]
+
+
+async def run(args, server=None):
+    images = [standins.make_image(args.image_width, args.image_height, seed) for seed in range(args.images)]
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, args.startup_timeout, server)
+        token, user_id = await sign_in(client, args.username, args.password, register=server is not None)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def predict(client, worker, iteration):
+            image = images[(worker + iteration) % len(images)]
+            if not args.repeat_images:
+                image += f"{worker}-{iteration}-{time.perf_counter_ns()}".encode()  # Ignored after the JPEG end marker
+            return await client.post("/predict", headers=headers, files={"file": ("bench.jpg", image, "image/jpeg")})
+
+        async def classifications(client, worker, iteration):
+            return await client.get(f"/classifications/{user_id}", headers=headers, params={"limit": args.page_size})
+
+        results = {}
+        for concurrency in args.concurrency:
+            results[f"predict_concurrency_{concurrency}"] = await run_phase(client, concurrency, args.duration, predict)
+            results[f"classifications_concurrency_{concurrency}"] = await run_phase(
+                client, concurrency, args.duration, classifications
+            )
+        server_stats = (await client.get("/metrics", params={"format": "json"})).json()
+    return results, server_stats
+
+
+def start_server(args, env):
+    subprocess.run(
+        [sys.executable, "-c", "import asyncio; from services import database; asyncio.run(database.init_db())"],
+        cwd=standins.PROJECT_DIR, env=env, check=True,
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+        cwd=standins.PROJECT_DIR, env=env,
+    )
+
+
+def main(args):
+    metadata = standins.run_metadata(args)
+    sink = server = None
+    try:
+        if args.url is None:
+            sink = standins.SMTPSink().start()
+            env = {
+                **os.environ,
+                **standins.standin_env(args.work_dir, smtp_port=sink.port, database_url=args.database_url),
+                "PIPELINE_ALERT_CLASSES": args.alert_classes,
+                "ALERT_DEDUPE_SECONDS": "0",
+            }
+            standins.ensure_tiny_model(env["MODEL_PATH"])
+            args.port = args.port or standins.free_port()
+            args.url = f"http://127.0.0.1:{args.port}"
+            args.username = args.username or f"bench-{uuid.uuid4().hex[:8]}"
+            args.password = args.password or "benchmark-password"
+            server = start_server(args, env)
+        results, server_stats = asyncio.run(run(args, server))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+        if sink is not None:
+            sink.stop()
+    standins.write_results({
+        "benchmark": "load",
+        "metadata": metadata,
+        "results": results,
+        "alert_emails_received": sink.messages if sink is not None else None,
+        "server_stats": server_stats,
+    }, args.output)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Load this running API instead of starting one on the stand-ins")
+    parser.add_argument("--username", help="Required with --url; a throwaway user is registered otherwise")
+    parser.add_argument("--password")
+    parser.add_argument("--work-dir", default="/tmp/burn-bench", help="Holds the tiny model, SQLite file and logs")
+    parser.add_argument("--database-url", help="Use this database instead of SQLite, e.g. a local Postgres")
+    parser.add_argument("--port", type=int, default=0, help="Port for the started API (default: any free port)")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--images", type=int, default=32, help="Distinct images to cycle through")
+    parser.add_argument("--image-width", type=int, default=640)
+    parser.add_argument("--image-height", type=int, default=480)
+    parser.add_argument("--repeat-images", action="store_true", help="Send identical bytes again, so the cache answers")
+    parser.add_argument("--page-size", type=int, default=100, help="limit for /classifications")
+    parser.add_argument("--alert-classes", default=standins.FEATURE_NAMES,
+                        help="Predicted classes that email the SMTP sink (default: all, so every prediction alerts)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+    if args.url is not None and not (args.username and args.password):
+        parser.error("--url needs --username and --password")
+    main(args)
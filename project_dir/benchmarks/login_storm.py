@@ -0,0 +1,90 @@
+"""Measure /predict latency with and without a concurrent login storm.
+
+Runs a steady /predict load against a running API, first alone and then
+while many clients hammer /login, and prints p50/p95/p99 latency for both
+phases as JSON. With bcrypt off the event loop the two should stay close.
+
+Usage:
+    python benchmarks/login_storm.py --url http://localhost:8000 \\
+        --username demo --password demo --image sample.jpg
+"""
+import time
+import json
+import asyncio
+import argparse
+import httpx
+
+from standins import percentiles
+
+
+async def predict_load(client, token, image, concurrency, duration):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/predict", headers=headers, files={"file": ("bench.jpg", image, "image/jpeg")})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return {**percentiles(latencies), "errors": errors}
+
+
+async def login_storm(client, username, password, concurrency, stop):
+    counts = {"ok": 0, "rejected": 0, "failed": 0}
+
+    async def worker():
+        while not stop.is_set():
+            response = await client.post("/login", json={"username": username, "password": password})
+            if response.status_code == 200:
+                counts["ok"] += 1
+            elif response.status_code == 503:
+                counts["rejected"] += 1
+            else:
+                counts["failed"] += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return counts
+
+
+async def main(args):
+    with open(args.image, "rb") as f:
+        image = f.read()
+    limits = httpx.Limits(max_connections=args.predict_concurrency + args.storm_concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        response = await client.post("/login", json={"username": args.username, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        baseline = await predict_load(client, token, image, args.predict_concurrency, args.duration)
+
+        stop = asyncio.Event()
+        storm = asyncio.create_task(login_storm(client, args.username, args.password, args.storm_concurrency, stop))
+        during_storm = await predict_load(client, token, image, args.predict_concurrency, args.duration)
+        stop.set()
+        logins = await storm
+
+    print(json.dumps({
+        "baseline": baseline,
+        "login_storm": during_storm,
+        "logins": logins,
+        "p99_ratio": during_storm.get("p99_ms", 0) / baseline["p99_ms"] if baseline.get("p99_ms") else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--image", required=True)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--predict-concurrency", type=int, default=4)
+    parser.add_argument("--storm-concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
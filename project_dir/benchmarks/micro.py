@@ -0,0 +1,227 @@
+"""Micro-benchmarks for preprocessing, inference, password hashing and database access.
+
+Runs offline against the local stand-ins from standins.py: a tiny random
+Keras model in place of MODEL_PATH and a SQLite database (or the Postgres
+given with --database-url). Each group calls the service functions the API
+uses and reports latency percentiles and throughput as JSON:
+
+- preprocess: image_service.decode_image and preprocess_bytes per image size
+- classify: classify_image_with_version at each --batch-sizes
+- login: auth_service.register and login (bcrypt), serially and concurrently
+- database: add_classification(s), get_user_classifications,
+  stream_user_classifications, add_feedback and get_feedback_aggregates
+
+Write the results with --output and compare two runs with compare.py.
+
+Usage:
+    python benchmarks/micro.py --work-dir /tmp/burn-bench --output micro.json
+    python benchmarks/micro.py --only preprocess,classify --batch-sizes 1,8,32
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime
+
+import standins
+
+GROUPS = ("preprocess", "classify", "login", "database")
+
+
+def time_calls(fn, iterations):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - started
+
+
+async def time_async_calls(fn, iterations, concurrency=1):
+    latencies, errors = [], 0
+
+    async def worker(count):
+        nonlocal errors
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                await fn()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    shares = [iterations // concurrency + (1 if index < iterations % concurrency else 0) for index in range(concurrency)]
+    await asyncio.gather(*[worker(count) for count in shares])
+    return latencies, time.perf_counter() - started, errors
+
+
+async def bench_preprocess(args):
+    from services.image_service import decode_image, preprocess_bytes
+    results = {}
+    for width, height in args.image_sizes:
+        for image_format in ("JPEG", "PNG"):
+            data = standins.make_image(width, height, image_format=image_format)
+            name = f"{image_format.lower()}_{width}x{height}"
+            decode_image(data)  # Warm up
+            latencies, elapsed = time_calls(lambda: decode_image(data), args.iterations)
+            results[f"decode_image_{name}"] = standins.summarize(latencies, elapsed)
+            latencies, elapsed = time_calls(lambda: preprocess_bytes([data]), args.iterations)
+            results[f"preprocess_bytes_{name}"] = standins.summarize(latencies, elapsed)
+    return results
+
+
+async def bench_classify(args):
+    import numpy as np
+    from services import classification_service
+    await classification_service.start_inference_pool()
+    if classification_service.get_model_status()["status"] != "ready":
+        raise RuntimeError(f"Model failed to load: {classification_service.get_model_status()}")
+    results = {}
+    try:
+        for batch_size in args.batch_sizes:
+            batch = np.random.default_rng(batch_size).random((batch_size, *classification_service.IMG_SIZE, 3), dtype=np.float32)
+            for _ in range(3):  # Warm up the graph for this batch shape
+                await classification_service.classify_image_with_version(batch)
+            latencies, elapsed, errors = await time_async_calls(
+                lambda: classification_service.classify_image_with_version(batch), args.iterations
+            )
+            results[f"classify_batch_{batch_size}"] = standins.summarize(latencies, elapsed, errors, items_per_call=batch_size)
+    finally:
+        await classification_service.stop_inference_pool()
+    return results
+
+
+async def bench_login(args):
+    from services import auth_service
+    username, password = f"bench-{uuid.uuid4().hex[:8]}", "benchmark-password"
+    results = {}
+    latencies, elapsed, errors = await time_async_calls(lambda: auth_service.register(username, password), 1)
+    results["register"] = standins.summarize(latencies, elapsed, errors)
+    latencies, elapsed, errors = await time_async_calls(
+        lambda: auth_service.login(username, password), args.login_iterations
+    )
+    results["login_serial"] = standins.summarize(latencies, elapsed, errors)
+    latencies, elapsed, errors = await time_async_calls(
+        lambda: auth_service.login(username, password), args.login_iterations, args.concurrency
+    )
+    results[f"login_concurrency_{args.concurrency}"] = standins.summarize(latencies, elapsed, errors)
+    return results
+
+
+async def bench_database(args):
+    from services import database
+    user = await database.create_user(f"bench-{uuid.uuid4().hex[:8]}", "not-a-real-hash")
+    counter = iter(range(10 ** 9))
+
+    def rows(count):
+        return [
+            {
+                "user_id": user.id,
+                "image_name": f"bench-{next(counter)}.jpg",
+                "predicted_class": "2nd degree burn",
+                "confidence": 0.9,
+                "timestamp": datetime.utcnow(),
+                "model_version": standins.TINY_MODEL_VERSION,
+            }
+            for _ in range(count)
+        ]
+
+    async def stream_all():
+        async for _ in database.stream_user_classifications(user.id):
+            pass
+
+    results = {}
+    latencies, elapsed, errors = await time_async_calls(
+        lambda: database.add_classification(user.id, "bench.jpg", "1st degree burn", 0.8), args.iterations
+    )
+    results["add_classification"] = standins.summarize(latencies, elapsed, errors)
+    latencies, elapsed, errors = await time_async_calls(
+        lambda: database.add_classifications(rows(args.rows_per_write)), args.iterations
+    )
+    results[f"add_classifications_{args.rows_per_write}"] = standins.summarize(
+        latencies, elapsed, errors, items_per_call=args.rows_per_write
+    )
+    latencies, elapsed, errors = await time_async_calls(
+        lambda: database.get_user_classifications(user.id, limit=100), args.iterations, args.concurrency
+    )
+    results["get_user_classifications_100"] = standins.summarize(latencies, elapsed, errors)
+    latencies, elapsed, errors = await time_async_calls(stream_all, max(1, args.iterations // 10))
+    results["stream_user_classifications_all"] = standins.summarize(latencies, elapsed, errors)
+    results["stream_user_classifications_all"]["rows"] = len(await database.get_user_classifications(user.id))
+
+    classification_ids = [row["id"] for row in await database.get_user_classifications(user.id, limit=args.rows_per_write)]
+    feedback = [
+        {
+            "user_id": user.id,
+            "classification_id": classification_id,
+            "feedback_text": "benchmark",
+            "is_correct": index % 2 == 0,
+            "corrected_class": None,
+            "timestamp": datetime.utcnow(),
+        }
+        for index, classification_id in enumerate(classification_ids)
+    ]
+    latencies, elapsed, errors = await time_async_calls(lambda: database.add_feedback(feedback), args.iterations)
+    results[f"add_feedback_{len(feedback)}"] = standins.summarize(latencies, elapsed, errors, items_per_call=len(feedback))
+    latencies, elapsed, errors = await time_async_calls(database.get_feedback_aggregates, args.iterations)
+    results["get_feedback_aggregates"] = standins.summarize(latencies, elapsed, errors)
+    return results
+
+
+async def run(args):
+    from services.logging_service import configure_logging
+    from services import database
+    configure_logging()
+    await database.init_db()
+    results = {"benchmark": "micro", "metadata": standins.run_metadata(args), "results": {}}
+    try:
+        for group in args.only:
+            results["results"][group] = await globals()[f"bench_{group}"](args)
+    finally:
+        await database.engine.dispose()
+    return results
+
+
+def main(args):
+    env = standins.standin_env(args.work_dir, database_url=args.database_url)
+    os.environ.update(env)
+    if "classify" in args.only:
+        standins.ensure_tiny_model(env["MODEL_PATH"])
+    sys.path.insert(0, standins.PROJECT_DIR)
+    standins.write_results(asyncio.run(run(args)), args.output)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def size_list(value):
+    return [tuple(int(side) for side in item.split("x")) for item in value.split(",") if item]
+
+
+def group_list(value):
+    groups = [item for item in value.split(",") if item]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown groups {', '.join(sorted(unknown))}, expected {', '.join(GROUPS)}")
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--work-dir", default="/tmp/burn-bench", help="Holds the tiny model, SQLite file and logs")
+    parser.add_argument("--database-url", help="Use this database instead of SQLite, e.g. a local Postgres")
+    parser.add_argument("--only", type=group_list, default=list(GROUPS), help=f"Comma-separated subset of {','.join(GROUPS)}")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--login-iterations", type=int, default=20, help="bcrypt is slow on purpose; keep this small")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int_list, default=[1, 8, 32])
+    parser.add_argument("--image-sizes", type=size_list, default=[(640, 480), (1920, 1080), (4032, 3024)])
+    parser.add_argument("--rows-per-write", type=int, default=50)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,187 @@
+"""Local stand-ins and helpers shared by the benchmark suite (micro.py, load.py).
+
+Everything the API normally reaches over the network or loads from disk is
+replaced with something local and reproducible:
+
+- a tiny, randomly initialized Keras model saved where MODEL_PATH points,
+  with the same input shape and class count as the real classifier
+- a SQLite database through DATABASE_URL (pass --database-url to use a
+  local Postgres instead)
+- an aiosmtpd SMTP sink that accepts and counts alert emails
+
+standin_env() returns the environment variables that point the services at
+these; they must be set before any ``services`` module is imported.
+"""
+import io
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import statistics
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FEATURE_NAMES = "1st degree burn,2nd degree burn,3rd degree burn"
+TINY_MODEL_VERSION = "tiny-random"
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def summarize(latencies, elapsed, errors=0, items_per_call=1):
+    """Latency percentiles plus calls (and items) per second over ``elapsed`` seconds."""
+    result = percentiles(latencies)
+    result["throughput_per_second"] = len(latencies) / elapsed if elapsed else 0.0
+    if items_per_call != 1:
+        result["items_per_second"] = len(latencies) * items_per_call / elapsed if elapsed else 0.0
+    result["errors"] = errors
+    return result
+
+
+def build_tiny_model(path, input_size=224, num_classes=3, seed=0):
+    """Save a small randomly initialized Keras classifier at ``path`` (once) and return the path.
+
+    It takes the same (input_size, input_size, 3) input and has the same
+    softmax output as the real model, so every code path runs unchanged;
+    only the model's own compute is much smaller.
+    """
+    if os.path.isdir(path):
+        return path
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(seed)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(input_size, input_size, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(num_classes, activation="softmax"),
+    ])
+    model.save(path)
+    return path
+
+
+def ensure_tiny_model(path):
+    """Build the tiny model in a separate interpreter, so this process never imports TensorFlow."""
+    if not os.path.isdir(path):
+        subprocess.run(
+            [sys.executable, "-c", f"import standins; standins.build_tiny_model({path!r})"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        )
+    return path
+
+
+class SMTPSink:
+    """Accepts every login and message on localhost and counts the messages (needs ``pip install aiosmtpd``)."""
+
+    def __init__(self, port=0):
+        self.port = port or free_port()
+        self.messages = 0
+        self._controller = None
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+    def start(self):
+        try:
+            from aiosmtpd.controller import Controller
+            from aiosmtpd.smtp import AuthResult
+        except ImportError:
+            raise SystemExit("The SMTP sink needs aiosmtpd: pip install aiosmtpd")
+        # Plain-text AUTH, so the alert pool logs in as it would against the real server
+        self._controller = Controller(
+            self, hostname="127.0.0.1", port=self.port,
+            authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False,
+        )
+        self._controller.start()
+        return self
+
+    def stop(self):
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def standin_env(work_dir, smtp_port=None, database_url=None):
+    """Environment pointing the services at the local stand-ins under ``work_dir``.
+
+    Without ``smtp_port`` alert email settings are left alone.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    env = {
+        "MODEL_PATH": os.path.join(work_dir, "tiny_model_saved"),
+        "MODEL_VERSION": TINY_MODEL_VERSION,
+        "FEATURE_NAMES": FEATURE_NAMES,
+        "INFERENCE_BACKEND": "keras",
+        "DATABASE_URL": database_url or f"sqlite+aiosqlite:///{os.path.join(work_dir, 'bench.db')}",
+        "SECRET_KEY": "benchmark-secret-key-not-for-production-use",
+        "PREDICTION_CACHE_BACKEND": "memory",
+        "LOG_FILE": os.path.join(work_dir, "app.log"),
+        "LOG_TO_STDERR": "false",
+        "TF_CPP_MIN_LOG_LEVEL": "2",
+    }
+    if smtp_port is not None:
+        env.update(
+            SMTP_SERVER="127.0.0.1", SMTP_PORT=str(smtp_port), SMTP_USE_TLS="false",
+            SENDER_EMAIL="alerts@benchmark.invalid", SENDER_PASSWORD="benchmark",
+            RECIPIENT_EMAIL="oncall@benchmark.invalid",
+        )
+    return env
+
+
+def make_image(width, height, seed=0, image_format="JPEG"):
+    """Encode random noise as an image; distinct seeds give distinct bytes, so no cache hits."""
+    import numpy as np
+    from PIL import Image
+    pixels = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def run_metadata(args):
+    """Where and how a run was made, so two result files can be told apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {name: value for name, value in vars(args).items() if name != "password"},
+    }
+
+
+def write_results(results, output=None):
+    text = json.dumps(results, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
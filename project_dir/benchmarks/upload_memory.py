@@ -0,0 +1,178 @@
+"""Measure peak memory per upload for the streaming ingestion path versus a full read.
+
+Generates a set of uploads (a large camera JPEG, a large PNG, a file over
+the byte limit, a PNG decompression bomb and an unsupported TIFF) and
+handles each one in a fresh interpreter, so the reported peak RSS belongs
+to that upload alone:
+
+- streaming: read_image_upload (chunked, byte cap, header sniffing) then preprocess_bytes
+- legacy: file.read() of the whole upload, Image.open and a full-size decode
+
+Like the API, the upload is served from a SpooledTemporaryFile that rolls
+over to disk past 1 MB. Results are printed as JSON.
+
+Usage:
+    python benchmarks/upload_memory.py --work-dir /tmp/upload-bench
+"""
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import struct
+import asyncio
+import argparse
+import resource
+import subprocess
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PIL_DEFAULT_MAX_IMAGE_PIXELS = int(1024 * 1024 * 1024 // 4 // 3)
+
+
+def png_bomb(path, width, height):
+    """Write a valid all-black grayscale PNG without ever holding its pixels in memory."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    compressor = zlib.compressobj(9)
+    row = b"\x00" * (width + 1)  # Filter byte plus one byte per pixel
+    idat = bytearray()
+    for _ in range(height):
+        idat += compressor.compress(row)
+    idat += compressor.flush()
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", bytes(idat)))
+        f.write(chunk(b"IEND", b""))
+
+
+def make_cases(work_dir, max_bytes):
+    import numpy as np
+    from PIL import Image
+    os.makedirs(work_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    cases = {}
+
+    path = os.path.join(work_dir, "camera.jpg")
+    Image.fromarray(rng.integers(0, 255, (3000, 4000, 3), dtype=np.uint8)).save(path, quality=90)
+    cases["camera_jpeg_12mp"] = path
+
+    path = os.path.join(work_dir, "large.png")
+    gradient = np.tile(np.arange(5000, dtype=np.uint16) % 256, (4000, 1)).astype(np.uint8)
+    Image.fromarray(np.stack([gradient] * 3, axis=-1)).save(path)
+    cases["gradient_png_20mp"] = path
+
+    path = os.path.join(work_dir, "oversized.jpg")
+    with open(os.path.join(work_dir, "camera.jpg"), "rb") as src, open(path, "wb") as f:
+        data = src.read()
+        while f.tell() <= max_bytes:
+            f.write(data)
+    cases["over_byte_limit"] = path
+
+    path = os.path.join(work_dir, "bomb.png")
+    png_bomb(path, 12000, 12000)
+    cases["png_bomb_144mp"] = path
+
+    path = os.path.join(work_dir, "scan.tiff")
+    Image.fromarray(rng.integers(0, 255, (2000, 2000, 3), dtype=np.uint8)).save(path)
+    cases["unsupported_tiff"] = path
+    return cases
+
+
+def peak_rss_mb():
+    # ru_maxrss survives exec on Linux, so it would include the parent's peak; VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+async def handle_upload(path, mode):
+    from starlette.datastructures import UploadFile
+    from PIL import Image
+    import numpy as np
+    from services import image_service
+
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(1024 * 1024)
+            if not data:
+                break
+            spool.write(data)
+    size = spool.tell()
+    spool.seek(0)
+    upload = UploadFile(spool, size=size, filename=os.path.basename(path))
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        if mode == "streaming":
+            contents = await image_service.read_image_upload(upload)
+            batch = image_service.preprocess_bytes([contents])
+        else:
+            Image.MAX_IMAGE_PIXELS = PIL_DEFAULT_MAX_IMAGE_PIXELS
+            contents = await upload.read()
+            image = Image.open(io.BytesIO(contents)).convert("RGB")
+            batch = np.expand_dims(np.asarray(image.resize((224, 224))) / 255.0, axis=0)
+        outcome = f"ok {tuple(batch.shape)}"
+    except image_service.UploadRejectedError as e:
+        outcome = f"rejected {e.status_code}: {e}"
+    except Exception as e:
+        outcome = f"error: {type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {
+        "outcome": outcome,
+        "seconds": elapsed,
+        "peak_rss_mb": peak,
+        "peak_rss_growth_mb": peak - baseline,
+    }
+
+
+def run_child(path, mode):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", path, "--mode", mode],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        return {"outcome": f"crashed: {completed.stderr.strip().splitlines()[-1:]}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    from services.image_service import UPLOAD_MAX_BYTES, UPLOAD_MAX_PIXELS
+    cases = make_cases(args.work_dir, UPLOAD_MAX_BYTES)
+    results = []
+    for name, path in cases.items():
+        for mode in args.modes:
+            result = {"case": name, "mode": mode, "file_bytes": os.path.getsize(path)}
+            result.update(run_child(path, mode))
+            results.append(result)
+    print(json.dumps({
+        "upload_max_bytes": UPLOAD_MAX_BYTES,
+        "upload_max_pixels": UPLOAD_MAX_PIXELS,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "upload-bench"))
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["streaming", "legacy"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="streaming", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(handle_upload(args.child, args.mode))))
+    else:
+        main(args)
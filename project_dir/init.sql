@@ -1,6 +1,80 @@
+-- Schema for a new database. Postgres only runs this when its data volume is first
+-- created; upgrade an existing database with project_dir/tools/migrate.py instead.
 CREATE TABLE users (
     id SERIAL PRIMARY KEY,
     username VARCHAR(255) UNIQUE NOT NULL,
     password_hash VARCHAR(255) NOT NULL
 );
 
+CREATE TABLE IF NOT EXISTS classifications (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    image_name VARCHAR,
+    predicted_class VARCHAR,
+    confidence DOUBLE PRECISION,
+    timestamp TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    model_version VARCHAR
+);
+
+-- Per-user history is read newest first and paginated on (timestamp, id)
+CREATE INDEX IF NOT EXISTS ix_classifications_user_id_timestamp ON classifications (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    classification_id INTEGER REFERENCES classifications(id),
+    feedback_text VARCHAR,
+    is_correct BOOLEAN,
+    corrected_class VARCHAR,
+    timestamp TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+CREATE INDEX IF NOT EXISTS ix_feedback_classification_id ON feedback (classification_id);
+CREATE INDEX IF NOT EXISTS ix_feedback_user_id_timestamp ON feedback (user_id, timestamp);
+
+-- Running feedback counts per model version and predicted class, updated in the same
+-- transaction as each batch of feedback so dashboards never scan the feedback table
+CREATE TABLE IF NOT EXISTS feedback_aggregates (
+    model_version VARCHAR NOT NULL,
+    predicted_class VARCHAR NOT NULL,
+    agree_count INTEGER NOT NULL DEFAULT 0,
+    disagree_count INTEGER NOT NULL DEFAULT 0,
+    unrated_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (model_version, predicted_class)
+);
+
+-- Running classification counts per user (0 for clinic-wide totals), predicted class and
+-- confidence bucket, and per user, UTC day and predicted class, updated in the same
+-- transaction as each insert so /statistics never scans the classifications table.
+-- Existing history is loaded with tools/backfill_stats.py
+CREATE TABLE IF NOT EXISTS classification_stats (
+    user_id INTEGER NOT NULL,
+    predicted_class VARCHAR NOT NULL,
+    confidence_bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (user_id, predicted_class, confidence_bucket)
+);
+
+CREATE TABLE IF NOT EXISTS classification_daily_stats (
+    user_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    predicted_class VARCHAR NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (user_id, day, predicted_class)
+);
+
+-- Chunks of a tools/reclassify.py database load, inserted in the same transaction as each
+-- chunk's COPY so a resumed run skips exactly the chunks that were committed
+CREATE TABLE IF NOT EXISTS bulk_load_chunks (
+    run_id VARCHAR NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    loaded_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (run_id, chunk_index)
+);
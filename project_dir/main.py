@@ -1,22 +1,56 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Form
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime, date
+import os
+import json
+import asyncio
+import zipfile
+import uuid
+import time
 import logging
 from dotenv import load_dotenv
-from services.auth_service import login, register, get_user_id_from_token, validate_user_access
-from services.image_service import process_upload
-from services.report_service import generate_report
-from services.database import get_user_classifications as db_get_user_classifications
-from services.classification_service import classify_image, save_classification
+from services.logging_service import configure_logging, request_id_var, get_logging_stats
+from services.metrics_service import (
+    render_metrics, stage_timer, observe_stage, queue_collector, REQUEST_SECONDS, REQUESTS_IN_FLIGHT
+)
+from services.profiling_service import profiler
+from services.auth_service import (
+    login, register, get_user_id_from_token, validate_user_access, validate_admin_access, password_hasher
+)
+from services.image_service import extract_zip_images, read_upload, read_image_upload, UploadRejectedError, UPLOAD_MAX_BYTES
+from services.report_job_service import report_jobs, submit_classification_report, ReportNotFoundError
+from services.alert_service import alert_dispatcher
+from services.feedback_service import save_feedback, get_feedback_summary, feedback_writer, FeedbackNotFoundError
+from services.statistics_service import get_classification_summary
+from services.database import (
+    get_user_classifications as db_get_user_classifications, stream_user_classifications, encode_cursor, decode_cursor,
+    get_pool_stats, ALL_USERS
+)
+from services.classification_service import (
+    classify_uploads, save_classification,
+    start_inference_pool, stop_inference_pool, get_inference_stats, get_model_status, prediction_cache,
+    classification_writer, ModelNotReadyError, RETRYABLE_ERRORS, list_models, register_model, remove_model, activate_model,
+    set_shadow_model, clear_shadow_model, MODEL_SHADOW_FRACTION, FEATURE_NAMES
+)
+from services.executor_service import ExecutorOverloadedError
+from pipelines.classification_pipeline import classification_pipeline, run_classification_pipeline
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, filename='app.log', filemode='a', format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging: every module logs through one queue to a background writer thread,
+# so no request waits on log I/O
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Batch prediction limits
+PREDICT_BATCH_MAX_FILES = int(os.getenv('PREDICT_BATCH_MAX_FILES', '64'))
+PREDICT_BATCH_MAX_BYTES = int(os.getenv('PREDICT_BATCH_MAX_BYTES', str(256 * 1024 * 1024)))
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
 app = FastAPI(title="Burn Classification API", version="1.0.0")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -29,22 +63,115 @@ class Classification(BaseModel):
     image_name: str
     predicted_class: str
     confidence: float
+    model_version: Optional[str] = None
+
+class ModelRegistration(BaseModel):
+    version: str
+    path: str
+    backend: Optional[str] = None
+
+class ShadowModel(BaseModel):
+    version: str
+    fraction: float = MODEL_SHADOW_FRACTION
+
+# Queue depths are read from each component's stats() when /metrics is scraped
+queue_collector.register("inference_batcher", lambda: get_inference_stats()["batcher"], capacity_key="max_pending")
+queue_collector.register("inference_pool", lambda: get_inference_stats()["pool"])
+queue_collector.register("pipeline", classification_pipeline.stats, depth_key="in_flight", capacity_key=None)
+for stage in classification_pipeline.stages:
+    queue_collector.register(f"pipeline_{stage.name}", lambda stage=stage: stage.stats(0))
+queue_collector.register("classification_writer", classification_writer.stats, depth_key="buffered_rows", capacity_key=None)
+queue_collector.register("feedback_writer", feedback_writer.stats, depth_key="buffered_rows", capacity_key=None)
+queue_collector.register("password_hasher", password_hasher.stats)
+queue_collector.register("report_jobs", report_jobs.stats, depth_key="queued", capacity_key="max_queued")
+queue_collector.register("alerts", alert_dispatcher.stats, capacity_key="max_queued")
+queue_collector.register("logging", get_logging_stats)
+
+@app.middleware("http")
+async def request_id_middleware(request, call_next):
+    """Tag every log record written while handling a request with its X-Request-ID."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.middleware("http")
+async def metrics_middleware(request, call_next):
+    """Count in-flight requests and time each one by route template, so path parameters don't add series."""
+    status = 500
+    started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - started)
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application is starting up")
+    classification_writer.start()
+    feedback_writer.start()
+    report_jobs.start()
+    alert_dispatcher.start()
+    classification_pipeline.start()
+    # Load the model in the background so the API binds its port and serves
+    # /login etc. right away; /readyz reports when inference is available
+    app.state.model_loader = asyncio.create_task(start_inference_pool())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application is shutting down")
+    model_loader = getattr(app.state, "model_loader", None)
+    if model_loader is not None and not model_loader.done():
+        model_loader.cancel()
+        try:
+            await model_loader
+        except asyncio.CancelledError:
+            pass
+    # Finish images already in the pipeline while the model and writers are still up
+    await classification_pipeline.stop()
+    await stop_inference_pool()
+    # Drain buffered rows, including ones queued by the last in-flight predictions
+    await classification_writer.stop()
+    await feedback_writer.stop()
+    await report_jobs.stop()
+    # Flush pending digests and give queued alert emails a bounded time to go out
+    await alert_dispatcher.stop()
+    password_hasher.shutdown()
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is serving requests and the model has not failed to load."""
+    model = get_model_status()
+    status_code = 503 if model["status"] == "failed" else 200
+    return JSONResponse(status_code=status_code, content={"status": "ok" if status_code == 200 else "failed"})
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: the model is loaded in every inference worker and warmed up."""
+    model = get_model_status()
+    return JSONResponse(status_code=200 if model["status"] == "ready" else 503, content=model)
 
 @app.post("/login")
 async def login_endpoint(user: User):
     try:
         token, user_id = await login(user.username, user.password)
         return JSONResponse(content={"access_token": token, "token_type": "bearer", "user_id": user_id})
+    except ExecutorOverloadedError as e:
+        logger.warning("Login rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Too many login attempts in progress, please retry", headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
 @app.post("/register")
@@ -52,43 +179,369 @@ async def register_endpoint(user: User):
     try:
         user_id = await register(user.username, user.password)
         return JSONResponse(content={"message": "User registered successfully", "user_id": user_id})
+    except ExecutorOverloadedError as e:
+        logger.warning("Registration rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Too many registrations in progress, please retry", headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Registration error: {str(e)}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/predict")
-async def predict(background_tasks: BackgroundTasks, token: str = Depends(oauth2_scheme), file: UploadFile = File(...)):
+async def predict(token: str = Depends(oauth2_scheme), file: UploadFile = File(...)):
     try:
-        user_id = await get_user_id_from_token(token)
-        image = await process_upload(file)
-        predicted_class, confidence = await classify_image(image)
+        with stage_timer("auth"):
+            user_id = await get_user_id_from_token(token)
+        with stage_timer("upload_read"):
+            contents = await read_image_upload(file)
+        # Decoded, classified and queued for the database by the pipeline's stages
+        item = await run_classification_pipeline(user_id, file.filename, contents)
         classification = Classification(
             user_id=user_id,
             image_name=file.filename,
-            predicted_class=predicted_class,
-            confidence=confidence
+            predicted_class=item.predicted_class,
+            confidence=item.confidence,
+            model_version=item.model_version
         )
-        background_tasks.add_task(save_classification, classification)
         return JSONResponse(content={"classification": classification.dict()})
+    except UploadRejectedError as e:
+        logger.warning("Upload rejected: %s", e)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ExecutorOverloadedError as e:
+        logger.warning("Prediction rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Inference queue is full, please retry", headers={"Retry-After": "1"})
+    except ModelNotReadyError:
+        raise HTTPException(status_code=503, detail="Model is still loading, please retry", headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error("Prediction error: %s", e)
+        raise HTTPException(status_code=500, detail="Prediction failed")
+
+@app.post("/predict/batch")
+async def predict_batch(token: str = Depends(oauth2_scheme), files: List[UploadFile] = File(...)):
+    """Classify many images (or zip archives of images) and stream one NDJSON line per image."""
+    try:
+        with stage_timer("auth"):
+            user_id = await get_user_id_from_token(token)
+        uploads = []
+        received_bytes = 0
+        upload_started = time.perf_counter()
+        for file in files:
+            # The byte limit covers the whole request, so each file may use what the previous ones left
+            remaining_bytes = PREDICT_BATCH_MAX_BYTES - received_bytes
+            if file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip"):
+                contents = await read_upload(file, max_bytes=remaining_bytes)
+                try:
+                    images = await asyncio.to_thread(
+                        extract_zip_images, contents, PREDICT_BATCH_MAX_FILES, remaining_bytes
+                    )
+                except (ValueError, zipfile.BadZipFile) as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid archive {file.filename}: {str(e)}")
+                uploads.extend(images)
+                # Archives count at their uncompressed size, so a small zip cannot expand past the limit
+                received_bytes += sum(len(image) for _, image in images)
+            else:
+                contents = await read_image_upload(file, max_bytes=min(UPLOAD_MAX_BYTES, remaining_bytes))
+                uploads.append((file.filename, contents))
+                received_bytes += len(contents)
+        observe_stage("upload_read", time.perf_counter() - upload_started)
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No images in request")
+        if len(uploads) > PREDICT_BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {PREDICT_BATCH_MAX_FILES} images per batch")
+    except UploadRejectedError as e:
+        logger.warning("Batch upload rejected: %s", e)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error("Batch prediction error: %s", e)
         raise HTTPException(status_code=500, detail="Prediction failed")
 
+    async def stream_results():
+        async for index, result, error in classify_uploads([contents for _, contents in uploads]):
+            image_name = uploads[index][0]
+            if error is not None:
+                line = {"index": index, "image_name": image_name, "error": error, "retryable": error in RETRYABLE_ERRORS}
+            else:
+                classification = Classification(
+                    user_id=user_id,
+                    image_name=image_name,
+                    predicted_class=result[0],
+                    confidence=result[1],
+                    model_version=result[2]
+                )
+                # Queued as soon as it is known, so a client that disconnects mid-stream loses nothing already classified
+                await save_classification(classification)
+                line = {"index": index, "classification": classification.dict()}
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.get("/classifications/{user_id}")
-async def get_classifications(user_id: int, token: str = Depends(oauth2_scheme)):
+async def get_classifications(
+    user_id: int,
+    token: str = Depends(oauth2_scheme),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    predicted_class: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """Page through a user's classifications, newest first.
+
+    The next page's cursor is returned in the X-Next-Cursor header.
+    With format=ndjson every matching row is streamed instead, ignoring limit and cursor.
+    """
     try:
         await validate_user_access(token, user_id)
-        classifications = await db_get_user_classifications(user_id)
-        return JSONResponse(content=classifications)
+        filters = {"start": start, "end": end, "predicted_class": predicted_class}
+        if format == "ndjson":
+            async def export_rows():
+                async for row in stream_user_classifications(user_id, **filters):
+                    yield json.dumps(row) + "\n"
+            return StreamingResponse(export_rows(), media_type="application/x-ndjson")
+
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Fetch one extra row to learn whether another page exists
+        classifications = await db_get_user_classifications(user_id, limit=limit + 1, cursor=after, **filters)
+        headers = {}
+        if len(classifications) > limit:
+            classifications = classifications[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(classifications[-1])
+        return JSONResponse(content=classifications, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Get classifications error: {str(e)}")
+        logger.error("Get classifications error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to retrieve classifications")
 
+@app.post("/reports", status_code=202)
+async def submit_report(
+    token: str = Depends(oauth2_scheme),
+    classification_id: int = Form(...),
+    file: UploadFile = File(...)
+):
+    """Queue an Excel report (and, for alert classes, an alert email) for one of the user's classifications.
+
+    The class and confidence come from the stored classification; poll the returned job.
+    """
+    try:
+        user_id = await get_user_id_from_token(token)
+        contents = await read_image_upload(file)
+        job = await submit_classification_report(user_id, classification_id, bytes(contents))
+    except ReportNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ExecutorOverloadedError as e:
+        logger.warning("Report rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Report queue is full, please retry", headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error("Report submission error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to queue report")
+    return JSONResponse(status_code=202, content={
+        **job.to_dict(),
+        "status_url": f"/reports/{job.id}",
+        "download_url": f"/reports/{job.id}/download",
+    })
+
+async def get_user_report_job(token: str, job_id: str):
+    try:
+        user_id = await get_user_id_from_token(token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    job = report_jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return job
+
+@app.get("/reports/{job_id}")
+async def report_status(job_id: str, token: str = Depends(oauth2_scheme)):
+    job = await get_user_report_job(token, job_id)
+    return JSONResponse(content=job.to_dict())
+
+@app.get("/reports/{job_id}/download")
+async def download_report(job_id: str, token: str = Depends(oauth2_scheme)):
+    job = await get_user_report_job(token, job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=410, detail=job.error)
+    if job.status != "ready":
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}", headers={"Retry-After": "1"})
+    return Response(
+        content=job.result,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{job.file_name}"'}
+    )
+
+async def require_admin(token: str):
+    try:
+        await validate_admin_access(token)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+@app.get("/models")
+async def models_endpoint(token: str = Depends(oauth2_scheme)):
+    await require_admin(token)
+    return JSONResponse(content={"models": list_models(), "status": get_model_status()})
+
+@app.post("/models")
+async def register_model_endpoint(model: ModelRegistration, token: str = Depends(oauth2_scheme)):
+    """Register a model artifact so it can be shadowed or activated."""
+    await require_admin(token)
+    try:
+        backend = model.backend or get_model_status()["backend"]
+        return JSONResponse(content=register_model(model.version, model.path, backend))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/models/shadow")
+async def set_shadow_endpoint(shadow: ShadowModel, token: str = Depends(oauth2_scheme)):
+    """Score a fraction of traffic on a candidate model, off the request path."""
+    await require_admin(token)
+    try:
+        return JSONResponse(content=await set_shadow_model(shadow.version, shadow.fraction))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (ModelNotReadyError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error("Shadow model error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to load shadow model")
+
+@app.delete("/models/shadow")
+async def clear_shadow_endpoint(token: str = Depends(oauth2_scheme)):
+    await require_admin(token)
+    return JSONResponse(content=clear_shadow_model())
+
+@app.post("/models/{version}/activate")
+async def activate_model_endpoint(version: str, token: str = Depends(oauth2_scheme)):
+    """Hot-swap the serving model; in-flight requests finish on the previous version."""
+    await require_admin(token)
+    try:
+        return JSONResponse(content=await activate_model(version))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except (ModelNotReadyError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error("Model activation error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to activate model")
+
+@app.delete("/models/{version}")
+async def remove_model_endpoint(version: str, token: str = Depends(oauth2_scheme)):
+    await require_admin(token)
+    try:
+        remove_model(version)
+        return JSONResponse(content={"message": f"Model {version} removed"})
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.post("/feedback")
-async def feedback_endpoint(user_id: int, classification_id: int, feedback_text: str, token: str = Depends(oauth2_scheme)):
+async def feedback_endpoint(
+    user_id: int,
+    classification_id: int,
+    feedback_text: str,
+    token: str = Depends(oauth2_scheme),
+    is_correct: Optional[bool] = None,
+    corrected_class: Optional[str] = None
+):
+    """Record feedback on a classification; it is written in bulk shortly after this returns."""
+    try:
+        await validate_user_access(token, user_id)
+    except Exception:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
     try:
-        await save_feedback(user_id, classification_id, feedback_text)
+        await save_feedback(user_id, classification_id, feedback_text, is_correct, corrected_class, FEATURE_NAMES)
         return JSONResponse(content={"message": "Feedback submitted successfully"})
+    except FeedbackNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Feedback error: {str(e)}")
+        logger.error("Feedback error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to submit feedback")
+
+@app.get("/feedback/summary")
+async def feedback_summary_endpoint(token: str = Depends(oauth2_scheme), model_version: Optional[str] = None):
+    """Per-class agreement between user feedback and the model, for model-quality dashboards."""
+    await require_admin(token)
+    try:
+        return JSONResponse(content=await get_feedback_summary(model_version))
+    except Exception as e:
+        logger.error("Feedback summary error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to retrieve feedback summary")
+
+@app.get("/statistics")
+async def clinic_statistics_endpoint(
+    token: str = Depends(oauth2_scheme), start: Optional[date] = None, end: Optional[date] = None
+):
+    """Clinic-wide counts by class, confidence distribution and daily trend between start and end (admin only)."""
+    await require_admin(token)
+    return await statistics_response(ALL_USERS, start, end)
+
+@app.get("/statistics/{user_id}")
+async def user_statistics_endpoint(
+    user_id: int, token: str = Depends(oauth2_scheme), start: Optional[date] = None, end: Optional[date] = None
+):
+    """A user's counts by class, confidence distribution and daily trend between start and end."""
+    try:
+        await validate_user_access(token, user_id)
+    except Exception:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+    return await statistics_response(user_id, start, end)
+
+async def statistics_response(user_id, start, end):
+    try:
+        return JSONResponse(content=await get_classification_summary(user_id, start, end))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Statistics error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
+
+@app.get("/metrics")
+async def metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """Prometheus metrics, or with format=json the component stats they are partly read from."""
+    if format == "prometheus":
+        content, content_type = render_metrics()
+        return Response(content=content, media_type=content_type)
+    return JSONResponse(content={
+        "inference": get_inference_stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "classification_writer": classification_writer.stats(),
+        "feedback_writer": feedback_writer.stats(),
+        "password_hasher": password_hasher.stats(),
+        "report_jobs": report_jobs.stats(),
+        "alerts": alert_dispatcher.stats(),
+        "pipeline": classification_pipeline.stats(),
+        "db_pool": get_pool_stats(),
+        "logging": get_logging_stats(),
+        "profiler": profiler.stats(),
+    })
+
+@app.post("/debug/profile", status_code=202)
+async def start_profile_endpoint(token: str = Depends(oauth2_scheme), seconds: float = Query(30, gt=0)):
+    """Start sampling this process's Python stacks for a while (admin only)."""
+    await require_admin(token)
+    if not profiler.start(seconds):
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    return profiler.stats()
+
+@app.delete("/debug/profile")
+async def stop_profile_endpoint(token: str = Depends(oauth2_scheme)):
+    await require_admin(token)
+    await asyncio.to_thread(profiler.stop)
+    return profiler.stats()
+
+@app.get("/debug/profile")
+async def get_profile_endpoint(token: str = Depends(oauth2_scheme)):
+    """The samples collected so far as collapsed stacks, ready for flamegraph.pl or speedscope."""
+    await require_admin(token)
+    return Response(content=profiler.collapsed(), media_type="text/plain")
@@ -1,21 +1,375 @@
-from project_dir.services.logging_service import log_info, log_error
-from project_dir.services.classification_service import classify_image, save_classification
-from project_dir.services.feedback_service import save_feedback
+import os
+import time
+import asyncio
+import logging
+from dotenv import load_dotenv
+from services.image_service import decode_image, preprocess_batch
+from services.batching_service import INFERENCE_MAX_BATCH_SIZE
+from services.classification_service import (
+    classify_image_with_version, save_classification, record_prediction, lookup_cached_prediction, cache_prediction,
+    IMG_SIZE, INFERENCE_WORKERS
+)
+from services.alert_service import alert_dispatcher, ALERT_CLASSES
+from services.executor_service import ExecutorOverloadedError
+from services.logging_service import request_id_var
+from services.metrics_service import observe_stage
 
-async def run_classification_pipeline(image, user_id):
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Pipeline stage configuration
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '64'))  # Per stage
+PIPELINE_DECODE_WORKERS = int(os.getenv('PIPELINE_DECODE_WORKERS', str(min(4, os.cpu_count() or 1))))
+PIPELINE_PREPROCESS_WORKERS = int(os.getenv('PIPELINE_PREPROCESS_WORKERS', '2'))
+# Enough concurrent submissions for the micro-batcher to fill a batch on every inference worker
+PIPELINE_INFERENCE_WORKERS = int(os.getenv('PIPELINE_INFERENCE_WORKERS', str(INFERENCE_MAX_BATCH_SIZE * INFERENCE_WORKERS)))
+PIPELINE_PERSIST_WORKERS = int(os.getenv('PIPELINE_PERSIST_WORKERS', '1'))
+PIPELINE_ALERT_WORKERS = int(os.getenv('PIPELINE_ALERT_WORKERS', '1'))
+# Predicted classes that raise an emergency alert; shared with report emails
+PIPELINE_ALERT_CLASSES = ALERT_CLASSES
+PIPELINE_DRAIN_SECONDS = float(os.getenv('PIPELINE_DRAIN_SECONDS', '10'))
+
+
+class PipelineItem:
+    """One image travelling through the pipeline, collecting each stage's output."""
+
+    def __init__(self, user_id, image_name, contents):
+        self.user_id = user_id
+        self.image_name = image_name
+        self.contents = contents
+        self.image = None
+        self.batch = None
+        self.cache_key = None
+        self.cache_version = None
+        self.cached = False
+        self.predicted_class = None
+        self.confidence = None
+        self.model_version = None
+        self.alert_status = None
+        self.error = None
+        self.stage = None
+        self.submitted_at = time.perf_counter()
+        self.enqueued_at = self.submitted_at
+        self.future = None
+        self.request_id = None
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "image_name": self.image_name,
+            "predicted_class": self.predicted_class,
+            "confidence": self.confidence,
+            "model_version": self.model_version,
+            "cached": self.cached,
+            "alert_status": self.alert_status,
+            "error": None if self.error is None else f"{self.stage}: {self.error}",
+        }
+
+
+class PipelineStage:
+    """A bounded queue feeding ``workers`` concurrent calls of ``handler(item)``.
+
+    Items for which ``skip(item)`` is true pass straight through. Latency is
+    the time spent in ``handler``; queue wait is the time between being
+    queued and picked up by a worker.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=PIPELINE_QUEUE_SIZE, skip=None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.skip = skip
+        self.queue = None
+        self._busy = 0
+        self._processed = 0
+        self._skipped = 0
+        self._failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._wait_total = 0.0
+        self._max_queue_depth = 0
+
+    async def handle(self, item):
+        """Run the handler on ``item`` unless it is skipped, recording latency and failures."""
+        if self.skip is not None and self.skip(item):
+            self._skipped += 1
+            return
+        started = time.perf_counter()
+        self._busy += 1
+        try:
+            await self.handler(item)
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._busy -= 1
+        latency = time.perf_counter() - started
+        self._processed += 1
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._wait_total += started - item.enqueued_at
+        observe_stage(self.name, latency)
+
+    def note_depth(self):
+        self._max_queue_depth = max(self._max_queue_depth, self.queue.qsize())
+
+    def stats(self, uptime):
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue": self.queue_size,
+            "max_queue_depth": self._max_queue_depth,
+            "processed": self._processed,
+            "skipped": self._skipped,
+            "failed": self._failed,
+            "items_per_second": self._processed / uptime if uptime else 0.0,
+            "avg_latency_ms": self._latency_total / self._processed * 1000 if self._processed else 0.0,
+            "max_latency_ms": self._latency_max * 1000,
+            "avg_queue_wait_ms": self._wait_total / self._processed * 1000 if self._processed else 0.0,
+        }
+
+
+class StagedPipeline:
+    """Runs items through a chain of stages, each with its own bounded queue and workers.
+
+    A worker only hands an item on once the next stage's queue has room, so
+    a slow stage fills the queues in front of it and ``submit`` blocks:
+    offline jobs are throttled to the slowest stage instead of buffering
+    without bound. Online callers use ``submit_nowait``, which raises
+    ``ExecutorOverloadedError`` when the first queue is full. An item that
+    fails in any stage skips the rest; its error is kept on the item.
+    """
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+        self._workers = []
+        self._started_at = None
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._latency_total = 0.0
+        self._in_flight = 0
+
+    def start(self):
+        """Start every stage's workers on the running event loop (idempotent)."""
+        if self._workers:
+            return
+        loop = asyncio.get_running_loop()
+        for index, stage in enumerate(self.stages):
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+            self._workers.extend(loop.create_task(self._stage_loop(index)) for _ in range(stage.workers))
+        self._started_at = time.perf_counter()
+        logger.info("%s pipeline started (%s)", self.name,
+                    ", ".join(f"{stage.name}={stage.workers}" for stage in self.stages))
+
+    async def stop(self, drain_seconds=PIPELINE_DRAIN_SECONDS):
+        """Let queued items finish for up to ``drain_seconds``, then stop; anything left fails."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("%s pipeline stopped with %s items in flight", self.name, self._in_flight)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for stage in self.stages:
+            while not stage.queue.empty():
+                self._finish(stage.queue.get_nowait(), stage, RuntimeError("Pipeline stopped"))
+        logger.info("%s pipeline stopped", self.name)
+
+    async def join(self):
+        """Wait until every stage queue is empty and no worker is busy."""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    def _admit(self, item):
+        self.start()
+        item.future = asyncio.get_running_loop().create_future()
+        item.request_id = request_id_var.get()
+        item.enqueued_at = time.perf_counter()
+        self._submitted += 1
+        self._in_flight += 1
+
+    async def submit(self, item):
+        """Queue ``item``, waiting for room in the first stage; returns a future resolved with the item."""
+        self._admit(item)
+        await self.stages[0].queue.put(item)
+        self.stages[0].note_depth()
+        return item.future
+
+    def submit_nowait(self, item):
+        """Queue ``item`` or raise ``ExecutorOverloadedError`` if the first stage is full."""
+        self.start()
+        first = self.stages[0]
+        if first.queue.full():
+            self._rejected += 1
+            raise ExecutorOverloadedError(f"{self.name} pipeline is full ({first.queue_size} queued items)")
+        self._admit(item)
+        first.queue.put_nowait(item)
+        first.note_depth()
+        return item.future
+
+    async def process(self, item):
+        """Run one item through the pipeline and return it; raises the item's error if it failed."""
+        item = await self.submit_nowait(item)
+        if item.error is not None:
+            raise item.error
+        return item
+
+    async def map(self, items):
+        """Feed ``items`` (any iterable) through the pipeline, yielding each one as it finishes.
+
+        Results arrive in completion order. Failed items are yielded too,
+        with ``item.error`` set, so one bad input never stops the run.
+        """
+        finished = asyncio.Queue()
+        fed = 0
+
+        async def feed():
+            nonlocal fed
+            for item in items:
+                future = await self.submit(item)
+                future.add_done_callback(lambda done: finished.put_nowait(done.result()))
+                fed += 1
+
+        feeder = asyncio.get_running_loop().create_task(feed())
+        yielded = 0
+        try:
+            while not feeder.done() or yielded < fed:
+                if feeder.done():
+                    item = await finished.get()
+                else:
+                    getter = asyncio.ensure_future(finished.get())
+                    await asyncio.wait({getter, feeder}, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    item = getter.result()
+                yielded += 1
+                yield item
+            await feeder  # Surface errors raised while iterating ``items``
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+
+    async def _stage_loop(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = await stage.queue.get()
+            request_id_var.set(item.request_id)  # Stage workers log under the request that submitted the item
+            try:
+                await stage.handle(item)
+            except asyncio.CancelledError:
+                self._finish(item, stage, RuntimeError("Pipeline stopped"))
+                raise
+            except Exception as e:
+                logger.error("%s pipeline %s stage failed for %s: %s", self.name, stage.name, item.image_name, e)
+                self._finish(item, stage, e)
+                stage.queue.task_done()
+                continue
+            try:
+                if next_stage is None:
+                    self._finish(item, stage)
+                else:
+                    item.enqueued_at = time.perf_counter()
+                    await next_stage.queue.put(item)  # Blocks while the next stage is backed up
+                    next_stage.note_depth()
+            except asyncio.CancelledError:
+                self._finish(item, stage, RuntimeError("Pipeline stopped"))
+                raise
+            finally:
+                stage.queue.task_done()
+
+    def _finish(self, item, stage, error=None):
+        if item.future is None or item.future.done():
+            return
+        self._in_flight -= 1
+        if error is not None:
+            item.error = error
+            item.stage = stage.name
+            self._failed += 1
+        else:
+            self._completed += 1
+            self._latency_total += time.perf_counter() - item.submitted_at
+        item.future.set_result(item)
+
+    def stats(self):
+        """Return end-to-end counts and per-stage throughput, latency and queue metrics."""
+        uptime = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        return {
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "items_per_second": self._completed / uptime if uptime else 0.0,
+            "avg_latency_ms": self._latency_total / self._completed * 1000 if self._completed else 0.0,
+            "stages": {stage.name: stage.stats(uptime) for stage in self.stages},
+        }
+
+
+async def _decode(item):
+    # Repeated uploads are answered from the prediction cache and skip preprocessing and inference
+    item.cache_key, item.cache_version, cached = await lookup_cached_prediction(item.contents)
+    if cached is not None:
+        item.predicted_class, item.confidence = cached
+        item.model_version = item.cache_version
+        item.cached = True
+        return
+    item.image = await asyncio.to_thread(decode_image, item.contents, IMG_SIZE)
+
+async def _preprocess(item):
+    item.batch = await asyncio.to_thread(preprocess_batch, [item.image], IMG_SIZE)
+    item.image = None
+
+async def _infer(item):
+    # Concurrent inference workers submit one image each; the micro-batcher groups them into model batches
+    item.predicted_class, item.confidence, item.model_version = await classify_image_with_version(item.batch)
+    item.batch = None
+    await cache_prediction(
+        item.contents, item.cache_key, item.cache_version, item.model_version, item.predicted_class, item.confidence
+    )
+
+async def _persist(item):
+    record_prediction(item.predicted_class, item.confidence, item.model_version, item.cached)
+    await save_classification(item)
+
+async def _alert(item):
+    item.alert_status = alert_dispatcher.submit(item.predicted_class, item.confidence, bytes(item.contents), item.image_name)
+
+def create_classification_pipeline(
+    decode_workers=PIPELINE_DECODE_WORKERS, preprocess_workers=PIPELINE_PREPROCESS_WORKERS,
+    inference_workers=PIPELINE_INFERENCE_WORKERS, persist_workers=PIPELINE_PERSIST_WORKERS,
+    alert_workers=PIPELINE_ALERT_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, alert_classes=PIPELINE_ALERT_CLASSES
+):
+    """Build the decode -> preprocess -> inference -> persist -> alert pipeline."""
+    return StagedPipeline("classification", [
+        PipelineStage("decode", _decode, decode_workers, queue_size),
+        PipelineStage("preprocess", _preprocess, preprocess_workers, queue_size, skip=lambda item: item.cached),
+        PipelineStage("inference", _infer, inference_workers, queue_size, skip=lambda item: item.cached),
+        PipelineStage("persist", _persist, persist_workers, queue_size),
+        PipelineStage("alert", _alert, alert_workers, queue_size,
+                      skip=lambda item: item.predicted_class not in alert_classes),
+    ])
+
+classification_pipeline = create_classification_pipeline()
+
+async def run_classification_pipeline(user_id, image_name, contents):
+    """Classify, store and (for alert classes) alert on one uploaded image; returns the finished item."""
     try:
-        # Step 1: Classification
-        predicted_class, confidence = await classify_image(image)
-
-        # Step 2: Save classification results
-        classification_id = await save_classification(user_id, image.filename, predicted_class, confidence)
-        
-        # Step 3: Gather feedback (optional)
-        feedback_text = "This was accurate"  # Example feedback
-        await save_feedback(user_id, classification_id, feedback_text)
-
-        log_info(f"Pipeline successful: {predicted_class} with confidence {confidence}")
-        return predicted_class, confidence
+        item = await classification_pipeline.process(PipelineItem(user_id, image_name, contents))
+        logger.debug("Pipeline successful: %s with confidence %s", item.predicted_class, item.confidence)
+        return item
     except Exception as e:
-        log_error(f"Error in classification pipeline: {str(e)}")
+        logger.error("Error in classification pipeline: %s", e)
         raise
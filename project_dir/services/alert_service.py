@@ -0,0 +1,349 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import aiosmtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.image import MIMEImage
+from dotenv import load_dotenv
+from .executor_service import ExecutorOverloadedError
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Email configuration
+SENDER_EMAIL = os.getenv('SENDER_EMAIL', 'aimlprojectsgroup6@gmail.com')
+SENDER_PASSWORD = os.getenv('SENDER_PASSWORD', 'aimlgroup6')
+RECIPIENT_EMAIL = os.getenv('RECIPIENT_EMAIL', 'nuvofamilynigeria@gmail.com')
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'false').lower() in ('1', 'true', 'yes')  # Implicit TLS, e.g. port 465
+SMTP_TIMEOUT_SECONDS = float(os.getenv('SMTP_TIMEOUT_SECONDS', '30'))
+
+# Alert dispatcher configuration
+ALERT_SMTP_CONNECTIONS = int(os.getenv('ALERT_SMTP_CONNECTIONS', '2'))
+ALERT_SMTP_IDLE_SECONDS = float(os.getenv('ALERT_SMTP_IDLE_SECONDS', '60'))
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', '1000'))
+ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', '5'))
+ALERT_BACKOFF_SECONDS = float(os.getenv('ALERT_BACKOFF_SECONDS', '2'))
+ALERT_DEDUPE_SECONDS = float(os.getenv('ALERT_DEDUPE_SECONDS', '300'))
+ALERT_DIGEST_SECONDS = float(os.getenv('ALERT_DIGEST_SECONDS', '0'))  # 0 disables digests
+ALERT_DIGEST_CLASSES = [name.strip() for name in os.getenv('ALERT_DIGEST_CLASSES', '3rd degree burn').split(',') if name.strip()]
+# Predicted classes that raise an emergency alert; empty disables alerting
+ALERT_CLASSES = [name.strip() for name in os.getenv('PIPELINE_ALERT_CLASSES', '').split(',') if name.strip()]
+ALERT_DIGEST_MAX_ITEMS = int(os.getenv('ALERT_DIGEST_MAX_ITEMS', '20'))
+ALERT_DRAIN_SECONDS = float(os.getenv('ALERT_DRAIN_SECONDS', '10'))
+
+
+def build_alert_message(alerts, sender=SENDER_EMAIL, recipient=RECIPIENT_EMAIL):
+    """Build one email for ``alerts``: a single alert, or a digest of several with every image attached."""
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    if len(alerts) == 1:
+        alert = alerts[0]
+        msg['Subject'] = f"Emergency Alert: {alert.predicted_class} Detected"
+        body = f"An emergency has been detected:\nPredicted Class: {alert.predicted_class}\nConfidence: {alert.confidence:.2f}"
+    else:
+        classes = sorted({alert.predicted_class for alert in alerts})
+        msg['Subject'] = f"Emergency Alert: {len(alerts)} cases of {', '.join(classes)} Detected"
+        lines = [
+            f"{index}. {alert.image_name}: {alert.predicted_class}, Confidence: {alert.confidence:.2f}, "
+            f"at {time.strftime('%H:%M:%S', time.localtime(alert.created_at))}"
+            for index, alert in enumerate(alerts, 1)
+        ]
+        body = f"{len(alerts)} emergencies have been detected:\n" + "\n".join(lines)
+    msg.attach(MIMEText(body, 'plain'))
+    for alert in alerts:
+        if alert.image_data:
+            msg.attach(MIMEImage(alert.image_data, name=os.path.basename(alert.image_name)))
+    return msg
+
+
+class Alert:
+    """One classification to alert on."""
+
+    def __init__(self, predicted_class, confidence, image_data, image_name="image.png"):
+        self.predicted_class = predicted_class
+        self.confidence = confidence
+        self.image_data = image_data
+        self.image_name = image_name
+        self.created_at = time.time()
+
+    @property
+    def dedupe_key(self):
+        """Same class for the same image bytes counts as a repeat."""
+        digest = hashlib.sha256(self.predicted_class.encode())
+        digest.update(b"\0")
+        digest.update(self.image_data or self.image_name.encode())
+        return digest.hexdigest()
+
+
+class _Outgoing:
+    def __init__(self, message, alert_count):
+        self.message = message
+        self.alert_count = alert_count
+        self.attempts = 0
+
+
+class SMTPConnectionPool:
+    """A fixed number of logged-in SMTP connections, reused across messages.
+
+    Connections are opened on first use, reopened after ``idle_seconds``
+    without traffic (servers drop idle clients) and discarded on any send
+    error, so the next message gets a fresh one.
+    """
+
+    def __init__(self, hostname=SMTP_SERVER, port=SMTP_PORT, username=SENDER_EMAIL, password=SENDER_PASSWORD,
+                 use_tls=SMTP_USE_TLS, size=ALERT_SMTP_CONNECTIONS, idle_seconds=ALERT_SMTP_IDLE_SECONDS,
+                 timeout=SMTP_TIMEOUT_SECONDS):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = max(1, int(size))
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+        self._idle = None
+        self._connects = 0
+        self._reuses = 0
+
+    def _ensure_started(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait((None, 0.0))
+
+    async def send(self, message):
+        """Send ``message`` on a pooled connection, waiting for one to be free."""
+        self._ensure_started()
+        client, last_used = await self._idle.get()
+        try:
+            if client is not None and (not client.is_connected or time.monotonic() - last_used > self.idle_seconds):
+                await self._close(client)
+                client = None
+            if client is None:
+                client = aiosmtplib.SMTP(
+                    hostname=self.hostname, port=self.port, use_tls=self.use_tls, timeout=self.timeout,
+                    username=self.username or None, password=self.password or None,
+                )
+                await client.connect()  # Negotiates STARTTLS when offered and logs in
+                self._connects += 1
+            else:
+                self._reuses += 1
+            await client.send_message(message)
+        except BaseException:
+            if client is not None:
+                await self._close(client)
+            self._idle.put_nowait((None, 0.0))
+            raise
+        self._idle.put_nowait((client, time.monotonic()))
+
+    async def _close(self, client):
+        try:
+            if client.is_connected:
+                await asyncio.wait_for(client.quit(), timeout=5)
+        except Exception:
+            client.close()
+
+    async def close(self):
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            client, _ = self._idle.get_nowait()
+            if client is not None:
+                await self._close(client)
+        self._idle = None
+
+    def stats(self):
+        return {"size": self.size, "connects": self._connects, "reuses": self._reuses}
+
+
+class AlertDispatcher:
+    """Queues alert emails and delivers them over a pooled SMTP connection.
+
+    ``submit`` never waits for SMTP. Repeats of the same alert inside
+    ``dedupe_seconds`` are dropped. Alerts for ``digest_classes`` are held
+    for up to ``digest_seconds`` (or ``digest_max_items``) and sent as one
+    digest message. Failed sends are retried with exponential backoff, up to
+    ``max_attempts``, without holding up the rest of the queue.
+    """
+
+    def __init__(self, transport=None, max_queued=ALERT_QUEUE_SIZE, max_attempts=ALERT_MAX_ATTEMPTS,
+                 backoff_seconds=ALERT_BACKOFF_SECONDS, dedupe_seconds=ALERT_DEDUPE_SECONDS,
+                 digest_seconds=ALERT_DIGEST_SECONDS, digest_classes=ALERT_DIGEST_CLASSES,
+                 digest_max_items=ALERT_DIGEST_MAX_ITEMS, sender=SENDER_EMAIL, recipient=RECIPIENT_EMAIL):
+        self.transport = transport or SMTPConnectionPool()
+        self.max_queued = max(1, int(max_queued))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_seconds = backoff_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.digest_seconds = digest_seconds
+        self.digest_classes = set(digest_classes)
+        self.digest_max_items = max(1, int(digest_max_items))
+        self.sender = sender
+        self.recipient = recipient
+        self._queue = None
+        self._senders = []
+        self._retry_handles = set()
+        self._recent = {}
+        self._digest = []
+        self._digest_handle = None
+        self._in_flight = 0
+        self._submitted = 0
+        self._deduplicated = 0
+        self._dropped = 0
+        self._digests = 0
+        self._sent_messages = 0
+        self._sent_alerts = 0
+        self._failed_messages = 0
+        self._retries = 0
+        self._send_seconds_total = 0.0
+
+    @property
+    def pool_size(self):
+        return getattr(self.transport, "size", 1)
+
+    def start(self):
+        """Start one sender per pooled connection on the running event loop (idempotent)."""
+        if self._senders:
+            return
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._senders = [loop.create_task(self._send_loop()) for _ in range(self.pool_size)]
+        logger.info("Alert dispatcher started (connections=%s, digest_seconds=%s)", self.pool_size, self.digest_seconds)
+
+    async def stop(self, drain_seconds=ALERT_DRAIN_SECONDS):
+        """Flush any pending digest, give queued messages ``drain_seconds`` to go out, then stop."""
+        if self._queue is not None:
+            self._flush_digest()
+            try:
+                await asyncio.wait_for(self.drain(), timeout=drain_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("Alert dispatcher stopped with %s messages unsent",
+                               self._queue.qsize() + len(self._retry_handles))
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        for sender in self._senders:
+            sender.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+        await self.transport.close()
+        logger.info("Alert dispatcher stopped")
+
+    async def drain(self):
+        """Wait until every queued message and scheduled retry has been delivered or given up on."""
+        while self._queue.qsize() or self._in_flight or self._retry_handles or self._digest:
+            await asyncio.sleep(0.01)
+
+    def submit(self, predicted_class, confidence, image_data, image_name="image.png"):
+        """Queue an alert; returns "queued", "digested" or "deduplicated".
+
+        Raises ``ExecutorOverloadedError`` when the outbound queue is full.
+        """
+        self.start()
+        alert = Alert(predicted_class, confidence, image_data, image_name)
+        now = time.monotonic()
+        key = None
+        if self.dedupe_seconds > 0:
+            self._prune_recent(now)
+            key = alert.dedupe_key
+            if key in self._recent:
+                self._deduplicated += 1
+                return "deduplicated"
+        if self._queue.qsize() >= self.max_queued:
+            self._dropped += 1
+            raise ExecutorOverloadedError(f"Alert queue is full ({self.max_queued} queued messages)")
+        if key is not None:
+            self._recent[key] = now
+        self._submitted += 1
+        if self.digest_seconds > 0 and predicted_class in self.digest_classes:
+            self._digest.append(alert)
+            if len(self._digest) >= self.digest_max_items:
+                self._flush_digest()
+            elif self._digest_handle is None:
+                self._digest_handle = asyncio.get_running_loop().call_later(self.digest_seconds, self._flush_digest)
+            return "digested"
+        self._queue.put_nowait(_Outgoing(build_alert_message([alert], self.sender, self.recipient), 1))
+        return "queued"
+
+    def _prune_recent(self, now):
+        # Dict order is insertion order, so expired keys are at the front
+        for key, seen_at in list(self._recent.items()):
+            if now - seen_at <= self.dedupe_seconds:
+                break
+            del self._recent[key]
+
+    def _flush_digest(self):
+        if self._digest_handle is not None:
+            self._digest_handle.cancel()
+            self._digest_handle = None
+        if not self._digest:
+            return
+        alerts, self._digest = self._digest, []
+        self._digests += int(len(alerts) > 1)
+        self._queue.put_nowait(_Outgoing(build_alert_message(alerts, self.sender, self.recipient), len(alerts)))
+
+    async def _send_loop(self):
+        while True:
+            outgoing = await self._queue.get()
+            outgoing.attempts += 1
+            self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                await self.transport.send(outgoing.message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._retry_later(outgoing, e)
+                continue
+            finally:
+                self._in_flight -= 1
+            self._send_seconds_total += time.perf_counter() - started
+            self._sent_messages += 1
+            self._sent_alerts += outgoing.alert_count
+            logger.info("Emergency email sent to %s (%s alerts)", self.recipient, outgoing.alert_count)
+
+    def _retry_later(self, outgoing, error):
+        if outgoing.attempts >= self.max_attempts:
+            self._failed_messages += 1
+            logger.error("Failed to send emergency email after %s attempts: %s", outgoing.attempts, error)
+            return
+        delay = self.backoff_seconds * 2 ** (outgoing.attempts - 1)
+        self._retries += 1
+        logger.warning("Failed to send emergency email (attempt %s), retrying in %.1fs: %s", outgoing.attempts, delay, error)
+
+        def retry():
+            self._retry_handles.discard(handle)
+            self._queue.put_nowait(outgoing)
+        handle = asyncio.get_running_loop().call_later(delay, retry)
+        self._retry_handles.add(handle)
+
+    def stats(self):
+        """Return queue depth, delivery and dedupe/digest metrics."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "pending_digest": len(self._digest),
+            "pending_retries": len(self._retry_handles),
+            "submitted": self._submitted,
+            "deduplicated": self._deduplicated,
+            "dropped": self._dropped,
+            "digests": self._digests,
+            "sent_messages": self._sent_messages,
+            "sent_alerts": self._sent_alerts,
+            "failed_messages": self._failed_messages,
+            "retries": self._retries,
+            "avg_send_seconds": self._send_seconds_total / self._sent_messages if self._sent_messages else 0.0,
+            "smtp": self.transport.stats() if hasattr(self.transport, "stats") else None,
+        }
+
+
+alert_dispatcher = AlertDispatcher()
@@ -1,9 +1,12 @@
 
 
 import jwt
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from .database import get_user, create_user
+from .executor_service import BoundedExecutor
 import os
 import logging
 from dotenv import load_dotenv
@@ -12,24 +15,67 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'aimlprojectsgroup6')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '300'))
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '32'))
+# Usernames allowed to manage models and other operational endpoints
+ADMIN_USERS = {name.strip() for name in os.getenv('ADMIN_USERS', '').split(',') if name.strip()}
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs here so a burst of logins cannot block the event loop; when the
+# queue is full, login/register fail fast with ExecutorOverloadedError
+password_hasher = BoundedExecutor(
+    "password-hash", max_workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_QUEUE_SIZE
+)
+
+# username -> (user_id, expires_at) for tokens issued without a "uid" claim
+_user_id_cache = OrderedDict()
+
+def _cache_user_id(username, user_id, token_expiry=None):
+    expires_at = time.time() + USER_CACHE_TTL_SECONDS
+    if token_expiry is not None:
+        expires_at = min(expires_at, token_expiry)  # Never outlive the token it was looked up for
+    _user_id_cache[username] = (user_id, expires_at)
+    _user_id_cache.move_to_end(username)
+    while len(_user_id_cache) > USER_CACHE_MAX_ENTRIES:
+        _user_id_cache.popitem(last=False)
+
+def _cached_user_id(username):
+    entry = _user_id_cache.get(username)
+    if entry is None:
+        return None
+    user_id, expires_at = entry
+    if expires_at <= time.time():
+        del _user_id_cache[username]
+        return None
+    return user_id
+
+def invalidate_user(username):
+    """Drop any cached identity for ``username`` after the user record changes."""
+    _user_id_cache.pop(username, None)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await password_hasher.run(get_password_hash, password)
+
 async def authenticate_user(username: str, password: str):
     user = await get_user(username)
-    if not user or not verify_password(password, user.password_hash):
+    if not user or not await verify_password_async(password, user.password_hash):
         return False
     return user
 
@@ -43,21 +89,23 @@ def create_access_token(data: dict):
 async def login(username: str, password: str):
     user = await authenticate_user(username, password)
     if not user:
-        logger.error(f"Login failed for user: {username}")
+        logger.error("Login failed for user: %s", username)
         raise ValueError("Incorrect username or password")
-    token = create_access_token(data={"sub": user.username})
-    logger.info(f"User {username} logged in successfully")
+    # The verified "uid" claim lets authenticated requests skip the user lookup
+    token = create_access_token(data={"sub": user.username, "uid": user.id})
+    logger.info("User %s logged in successfully", username)
     return token, user.id
 
 async def register(username: str, password: str):
     existing_user = await get_user(username)
     if existing_user:
-        logger.error(f"Registration failed: Username {username} already exists")
+        logger.error("Registration failed: Username %s already exists", username)
         raise ValueError("Username already exists")
-    hashed_password = get_password_hash(password)
-    user_id = await create_user(username, hashed_password)
-    logger.info(f"User {username} registered successfully")
-    return user_id
+    hashed_password = await get_password_hash_async(password)
+    user = await create_user(username, hashed_password)
+    invalidate_user(username)
+    logger.info("User %s registered successfully", username)
+    return user.id
 
 async def get_user_id_from_token(token: str):
     try:
@@ -66,15 +114,38 @@ async def get_user_id_from_token(token: str):
         if username is None:
             logger.error("Invalid token: username not found in payload")
             raise ValueError("Invalid token")
-        user = await get_user(username)
-        return user.id
+        user_id = payload.get("uid")
+        if user_id is not None:
+            return int(user_id)
+        # Tokens issued before the "uid" claim existed fall back to a cached lookup
+        user_id = _cached_user_id(username)
+        if user_id is None:
+            user = await get_user(username)
+            if user is None:
+                logger.error("Invalid token: user %s not found", username)
+                raise ValueError("Invalid token")
+            user_id = user.id
+            _cache_user_id(username, user_id, payload.get("exp"))
+        return user_id
     except jwt.PyJWTError as e:
-        logger.error(f"Invalid token: {str(e)}")
+        logger.error("Invalid token: %s", e)
         raise ValueError("Invalid token")
 
 async def validate_user_access(token: str, user_id: int):
     token_user_id = await get_user_id_from_token(token)
     if token_user_id != user_id:
-        logger.error(f"Unauthorized access: Token user ID {token_user_id} does not match requested user ID {user_id}")
+        logger.error("Unauthorized access: Token user ID %s does not match requested user ID %s", token_user_id, user_id)
+        raise ValueError("Unauthorized access")
+    logger.info("User access validated for user ID %s", user_id)
+
+async def validate_admin_access(token: str):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError as e:
+        logger.error("Invalid token: %s", e)
+        raise ValueError("Invalid token")
+    username = payload.get("sub")
+    if username not in ADMIN_USERS:
+        logger.error("Unauthorized access: %s is not an admin", username)
         raise ValueError("Unauthorized access")
-    logger.info(f"User access validated for user ID {user_id}")
\ No newline at end of file
+    return username
@@ -0,0 +1,173 @@
+import os
+import asyncio
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from .executor_service import ExecutorOverloadedError
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Batching configuration
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '16'))
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '2'))
+
+
+class MicroBatcher:
+    """Gathers concurrent inference requests into batches and runs one model call per batch.
+
+    Each submitted array carries its own leading batch dimension. Arrays are
+    concatenated along axis 0, passed to ``predict_fn`` in one call, and the
+    rows of the result are split back to the awaiting callers in order.
+
+    When ``predict_fn`` returns more than a plain array, ``split_fn(result,
+    start, stop)`` extracts each caller's share of it.
+
+    Up to ``max_concurrency`` batches are in flight at once. When
+    ``max_pending`` requests are already waiting or running, new requests are
+    rejected with ``ExecutorOverloadedError``.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                 max_concurrency=1, max_pending=None, split_fn=None):
+        self.predict_fn = predict_fn
+        self.split_fn = split_fn or (lambda predictions, start, stop: predictions[start:stop])
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_pending = max_pending
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._dispatches = set()
+        self._pending = 0
+        self._rejected = 0
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = {}
+
+    def start(self):
+        """Start the batching loop on the running event loop (idempotent)."""
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+                self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Micro-batcher started (max_batch_size=%s, max_wait_ms=%s)", self.max_batch_size, self.max_wait_ms)
+
+    async def stop(self):
+        """Stop the batching loop and fail any requests still waiting in the queue."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+        logger.info("Micro-batcher stopped")
+
+    async def submit(self, inputs):
+        """Queue ``inputs`` for the next batch and wait for its rows of the prediction."""
+        if self.max_pending is not None and self._pending >= self.max_pending:
+            self._rejected += 1
+            raise ExecutorOverloadedError(f"Inference queue is full ({self.max_pending} pending requests)")
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending += 1
+        try:
+            self._queue.put_nowait((inputs, future))
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+            return await future
+        finally:
+            self._pending -= 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free dispatch slot first so requests keep accumulating
+            # into the next batch while every worker is busy
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                rows = batch[0][0].shape[0]
+                deadline = loop.time() + self.max_wait_ms / 1000.0
+                while rows < self.max_batch_size:
+                    if self._queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        item = self._queue.get_nowait()
+                    batch.append(item)
+                    rows += item[0].shape[0]
+            except asyncio.CancelledError:
+                self._slots.release()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Inference batcher stopped"))
+                raise
+            task = loop.create_task(self._dispatch(batch, rows))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch, rows):
+        futures = [future for _, future in batch]
+        try:
+            inputs = batch[0][0] if len(batch) == 1 else np.concatenate([inputs for inputs, _ in batch], axis=0)
+            predictions = await self.predict_fn(inputs)
+        except Exception as e:
+            logger.error("Batched inference failed for %s requests: %s", len(batch), e)
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self._record_batch(rows)
+        offset = 0
+        for inputs, future in batch:
+            count = inputs.shape[0]
+            if not future.done():
+                future.set_result(self.split_fn(predictions, offset, offset + count))
+            offset += count
+
+    def _record_batch(self, rows):
+        self._batches += 1
+        self._items += rows
+        self._last_batch_size = rows
+        self._batch_size_counts[rows] = self._batch_size_counts.get(rows, 0) + 1
+
+    def stats(self):
+        """Return batch size and queue depth metrics."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_concurrency": self.max_concurrency,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self._rejected,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "items": self._items,
+            "last_batch_size": self._last_batch_size,
+            "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_size_counts.items())},
+        }
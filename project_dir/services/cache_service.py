@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Prediction cache configuration
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '10000'))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv('PREDICTION_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', '3600'))
+PREDICTION_CACHE_BACKEND = os.getenv('PREDICTION_CACHE_BACKEND', 'memory')  # 'memory' or 'sqlite'
+PREDICTION_CACHE_PATH = os.getenv('PREDICTION_CACHE_PATH', '/tmp/skinburnpro_prediction_cache.sqlite3')
+
+
+class SQLiteCacheBackend:
+    """On-disk cache shared by every API worker process on the same host."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        self.purge_expired()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM prediction_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prediction_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prediction_cache WHERE expires_at <= ?", (time.time(),))
+
+
+class PredictionCache:
+    """LRU/TTL cache of prediction results keyed by upload content hash and model version.
+
+    Entries live in an in-process LRU bounded by both entry count and an
+    approximate memory budget. An optional shared backend is consulted on
+    local misses and written through on every set.
+    """
+
+    def __init__(self, max_entries=PREDICTION_CACHE_MAX_ENTRIES, max_bytes=PREDICTION_CACHE_MAX_BYTES,
+                 ttl_seconds=PREDICTION_CACHE_TTL_SECONDS, backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(contents, model_version):
+        """Hash the uploaded bytes together with the model version that produced the result."""
+        digest = hashlib.sha256(model_version.encode())
+        digest.update(b"\0")
+        digest.update(contents)
+        return digest.hexdigest()
+
+    async def get(self, key):
+        """Return the cached result for ``key``, or None on a miss."""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value
+            self._remove(key)
+        if self.backend is not None:
+            try:
+                value = await asyncio.to_thread(self.backend.get, key)
+            except Exception as e:
+                logger.warning("Shared prediction cache lookup failed: %s", e)
+                value = None
+            if value is not None:
+                self._store(key, value)
+                self._hits += 1
+                self._shared_hits += 1
+                return value
+        self._misses += 1
+        return None
+
+    async def set(self, key, value):
+        """Cache ``value`` under ``key`` locally and in the shared backend."""
+        if not self.enabled:
+            return
+        self._store(key, value)
+        if self.backend is not None:
+            try:
+                await asyncio.to_thread(self.backend.set, key, value, self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Shared prediction cache write failed: %s", e)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _store(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        size = sys.getsizeof(key) + len(json.dumps(value))
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        """Return hit rate and occupancy metrics."""
+        lookups = self._hits + self._misses
+        return {
+            "backend": "sqlite" if isinstance(self.backend, SQLiteCacheBackend) else "memory",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "shared_hits": self._shared_hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+        }
+
+
+def create_prediction_cache():
+    """Build the prediction cache configured through the environment."""
+    backend = None
+    if PREDICTION_CACHE_BACKEND == 'sqlite':
+        try:
+            backend = SQLiteCacheBackend(PREDICTION_CACHE_PATH)
+        except Exception as e:
+            logger.error("Failed to open shared prediction cache at %s: %s", PREDICTION_CACHE_PATH, e)
+    return PredictionCache(backend=backend)
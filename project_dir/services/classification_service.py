@@ -1,16 +1,25 @@
 import os
+import time
+import asyncio
 import logging
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from .database import add_classification, get_user_classifications as db_get_user_classifications
+from datetime import datetime
+from .database import add_classifications, get_user_classifications as db_get_user_classifications
+from .batching_service import MicroBatcher
+from .executor_service import BoundedExecutor, ExecutorOverloadedError
+from .cache_service import create_prediction_cache
+from .image_service import preprocess_batch, decode_image
+from .persistence_service import WriteBehindBuffer
+from . import metrics_service
+from . import inference_worker
+from .inference_backends import BACKENDS
+from .model_registry import ModelRegistry, ModelSpec
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
@@ -19,67 +28,412 @@ IMG_SIZE = (224, 224)
 NUM_CLASSES = len(FEATURE_NAMES)
 MODEL_PATH = os.getenv('MODEL_PATH', '/project_dir/models/final_burn_classifier_model_saved')
 EXPECTED_ACCURACY = float(os.getenv('EXPECTED_ACCURACY', '0.80'))
+MODEL_VERSION = os.getenv('MODEL_VERSION', os.path.basename(MODEL_PATH.rstrip('/')))
+MODEL_SHADOW_FRACTION = float(os.getenv('MODEL_SHADOW_FRACTION', '0.1'))
+MODEL_PRELOAD_ROUNDS = int(os.getenv('MODEL_PRELOAD_ROUNDS', '5'))
 
-def load_pretrained_model(model_path):
-    """Load a pre-trained model from the specified path."""
+# Inference worker pool configuration
+INFERENCE_EXECUTOR = os.getenv('INFERENCE_EXECUTOR', 'thread')  # 'thread' or 'process'
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '2'))
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '64'))
+# 'keras' (reference), 'tflite' or 'onnx'; MODEL_PATH must point at the matching exported artifact
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras')
+INFERENCE_BACKEND_THREADS = int(os.getenv('INFERENCE_BACKEND_THREADS', '0')) or None
+
+# Classification write-behind configuration
+CLASSIFICATION_FLUSH_ROWS = int(os.getenv('CLASSIFICATION_FLUSH_ROWS', '200'))
+CLASSIFICATION_FLUSH_INTERVAL_MS = int(os.getenv('CLASSIFICATION_FLUSH_INTERVAL_MS', '500'))
+CLASSIFICATION_BUFFER_MAX_ROWS = int(os.getenv('CLASSIFICATION_BUFFER_MAX_ROWS', '10000'))
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when a prediction arrives before the inference workers have loaded the model."""
+
+# Per-image errors from classify_uploads that go away on their own, so callers may retry the image
+BUSY_ERROR = "Inference queue is full"
+LOADING_ERROR = "Model is still loading"
+RETRYABLE_ERRORS = {BUSY_ERROR, LOADING_ERROR}
+
+# Worker pool holding one model instance per worker and version; created by start_inference_pool()
+inference_pool = None
+
+# MODEL_PATH / MODEL_VERSION / INFERENCE_BACKEND describe the model served at startup;
+# more versions are registered, activated and shadowed at runtime
+model_registry = ModelRegistry(ModelSpec(MODEL_VERSION, MODEL_PATH, INFERENCE_BACKEND))
+
+# Versions being loaded into the workers ahead of activation, kept alongside the registry's
+_preloading = set()
+_shadow_tasks = set()
+_model_lock = None
+
+# Model lifecycle: not_loaded -> loading -> ready (or failed)
+model_status = "not_loaded"
+model_error = None
+model_load_seconds = None
+
+def _keep_versions():
+    return model_registry.loaded_versions() | _preloading
+
+async def _predict_batch(batch):
+    """Run the serving model once over a batch gathered by the micro-batcher, off the event loop.
+
+    Returns the serving version together with the predictions, so a hot swap
+    while the batch runs still labels its results with the model that made them.
+    """
+    if inference_pool is None:
+        logger.error("Model not loaded")
+        raise ModelNotReadyError("Model not loaded")
+    spec = model_registry.serving
+    metrics_service.MODEL_BATCH_SIZE.observe(len(batch))
+    with metrics_service.stage_timer("model_predict"):
+        predictions = await inference_pool.run(inference_worker.predict, spec, batch, _keep_versions())
+    if model_registry.should_shadow():
+        _start_shadow_scoring(batch, predictions)
+    return spec.version, predictions
+
+def _split_batch_result(result, start, stop):
+    version, predictions = result
+    return version, predictions[start:stop]
+
+def _start_shadow_scoring(batch, predictions):
+    # Only borrow a worker that would otherwise sit idle, so shadow scoring never delays served traffic
+    if inference_pool.idle_workers == 0:
+        model_registry.record_shadow_skipped()
+        return
+    task = asyncio.get_running_loop().create_task(_shadow_score(model_registry.shadow, batch, predictions))
+    _shadow_tasks.add(task)
+    task.add_done_callback(_shadow_tasks.discard)
+
+async def _shadow_score(spec, batch, serving_predictions):
+    """Score a served batch on the shadow model and record how it compares; never affects the response."""
+    if inference_pool is None or model_registry.shadow != spec:
+        return
     try:
-        model = tf.keras.models.load_model(model_path)
-        logger.info(f"Model loaded successfully from {model_path}")
-        return model
+        shadow_predictions = await inference_pool.run(inference_worker.predict, spec, batch, _keep_versions())
     except Exception as e:
-        logger.error(f"Failed to load model from {model_path}: {e}")
+        model_registry.record_shadow_error()
+        logger.warning("Shadow scoring on model %s failed: %s", spec.version, e)
+        return
+    if model_registry.shadow == spec:
+        model_registry.record_shadow(serving_predictions, shadow_predictions)
+
+# Concurrent classify_image_with_version calls share model.predict calls through this batcher.
+# One batch per worker runs at a time; beyond INFERENCE_QUEUE_SIZE waiting
+# requests, new ones are rejected with ExecutorOverloadedError.
+inference_batcher = MicroBatcher(
+    _predict_batch,
+    max_concurrency=INFERENCE_WORKERS,
+    max_pending=INFERENCE_QUEUE_SIZE,
+    split_fn=_split_batch_result,
+)
+
+# Results for previously seen uploads, keyed by content hash and serving model version
+prediction_cache = create_prediction_cache()
+
+# Classification rows are buffered here and written with multi-row INSERTs
+classification_writer = WriteBehindBuffer(
+    "classifications",
+    add_classifications,
+    flush_rows=CLASSIFICATION_FLUSH_ROWS,
+    flush_interval_ms=CLASSIFICATION_FLUSH_INTERVAL_MS,
+    max_buffered_rows=CLASSIFICATION_BUFFER_MAX_ROWS,
+)
+
+async def start_inference_pool():
+    """Start the inference workers, each loading and warming up its own model instance.
+
+    Meant to run as a background task at startup: the API serves other
+    endpoints while this runs, and readiness is reported by get_model_status().
+    """
+    global inference_pool, model_status, model_error, model_load_seconds
+    if inference_pool is not None or model_status == "loading":
+        return
+    model_status = "loading"
+    model_error = None
+    started = time.perf_counter()
+    # The batcher keeps at most one batch per worker in flight; the extra queue
+    # room absorbs shadow scoring and model preloads during a hot swap
+    pool = BoundedExecutor(
+        "inference",
+        kind=INFERENCE_EXECUTOR,
+        max_workers=INFERENCE_WORKERS,
+        max_queue=INFERENCE_WORKERS,
+        initializer=inference_worker.init_worker,
+        initargs=(INFERENCE_BACKEND_THREADS,),
+    )
+    try:
+        await _load_on_workers(pool, model_registry.serving)
+    except asyncio.CancelledError:
+        pool.shutdown(wait=False)
+        model_status = "not_loaded"
         raise
+    except Exception as e:
+        pool.shutdown(wait=False)
+        model_status = "failed"
+        model_error = str(e)
+        logger.error("Failed to start inference workers: %s", e)
+        return
+    inference_pool = pool
+    inference_batcher.start()
+    model_load_seconds = time.perf_counter() - started
+    model_status = "ready"
+    logger.info("Inference pool ready with %s %s workers in %.1fs", pool.max_workers, INFERENCE_EXECUTOR, model_load_seconds)
+
+async def _load_on_workers(pool, spec):
+    """Load and warm up ``spec`` in every inference worker before it receives traffic."""
+    _preloading.add(spec.version)
+    try:
+        seen = set()
+        # Submitting one warm-up per worker makes the pool start (and load) all of them now;
+        # a worker that finishes early may take a second job, so repeat until all reported
+        for _ in range(max(1, MODEL_PRELOAD_ROUNDS)):
+            worker_ids = await asyncio.gather(*[
+                pool.run(inference_worker.warm_up, spec, (1, *IMG_SIZE, 3), _keep_versions())
+                for _ in range(pool.max_workers)
+            ])
+            seen.update(worker_ids)
+            if len(seen) >= pool.max_workers:
+                return
+        logger.warning("Model %s warmed up on %s of %s workers; the rest load it on first use",
+                       spec.version, len(seen), pool.max_workers)
+    finally:
+        _preloading.discard(spec.version)
+
+def _get_model_lock():
+    global _model_lock
+    if _model_lock is None:
+        _model_lock = asyncio.Lock()
+    return _model_lock
+
+def list_models():
+    """Return every registered model version and which one is serving or shadowing."""
+    return model_registry.list()
 
-# Load the pre-trained model
-model = load_pretrained_model(MODEL_PATH)
+def register_model(version, path, backend=INFERENCE_BACKEND):
+    """Make a model artifact available for activation or shadowing; nothing is loaded yet."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    if not os.path.exists(path):
+        raise ValueError(f"Model path {path} does not exist")
+    return model_registry.register(ModelSpec(version, path, backend))._asdict()
 
-async def classify_image(processed_image):
-    """Classify the processed image using the loaded pre-trained model."""
-    if model is None:
+def remove_model(version):
+    """Forget a registered version; the serving and shadow models cannot be removed."""
+    model_registry.unregister(version)
+
+async def activate_model(version):
+    """Hot-swap the serving model to ``version`` without dropping in-flight requests.
+
+    The new version is loaded and warmed up in every worker first; then the
+    registry switches over. Batches already running finish on the previous
+    version, which the workers unload on their next batch.
+    """
+    spec = model_registry.get(version)
+    if inference_pool is None:
+        raise ModelNotReadyError("Model not loaded")
+    async with _get_model_lock():
+        if spec != model_registry.serving:
+            await _load_on_workers(inference_pool, spec)
+            model_registry.activate(version)
+    return get_model_status()
+
+async def set_shadow_model(version, fraction=MODEL_SHADOW_FRACTION):
+    """Shadow-score ``fraction`` of served batches on ``version``, off the request path."""
+    spec = model_registry.get(version)
+    if inference_pool is None:
+        raise ModelNotReadyError("Model not loaded")
+    if spec == model_registry.serving:
+        raise ValueError(f"Model version {version} is already serving")
+    async with _get_model_lock():
+        await _load_on_workers(inference_pool, spec)
+        model_registry.set_shadow(version, fraction)
+    return model_registry.stats()
+
+def clear_shadow_model():
+    """Stop shadow scoring; workers unload the shadow model on their next batch."""
+    model_registry.clear_shadow()
+    return model_registry.stats()
+
+async def stop_inference_pool():
+    """Stop batching and shut down the inference workers."""
+    global inference_pool, model_status
+    await inference_batcher.stop()
+    for task in list(_shadow_tasks):
+        task.cancel()
+    if _shadow_tasks:
+        await asyncio.gather(*_shadow_tasks, return_exceptions=True)
+    if inference_pool is not None:
+        inference_pool.shutdown()
+        inference_pool = None
+    model_status = "not_loaded"
+
+def get_model_status():
+    """Return whether the model is loaded and warmed up, for the readiness probe."""
+    return {
+        "status": model_status,
+        "model_version": model_registry.serving.version,
+        "backend": model_registry.serving.backend,
+        "shadow_version": model_registry.shadow.version if model_registry.shadow is not None else None,
+        "workers": INFERENCE_WORKERS,
+        "load_seconds": model_load_seconds,
+        "error": model_error,
+    }
+
+def get_inference_stats():
+    """Return micro-batching, worker pool and model registry metrics."""
+    return {
+        "batcher": inference_batcher.stats(),
+        "pool": inference_pool.stats() if inference_pool is not None else None,
+        "models": model_registry.stats(),
+    }
+
+def record_prediction(predicted_class, confidence, model_version, cached=False):
+    """Count a served prediction in the metrics, flagging it when below EXPECTED_ACCURACY."""
+    metrics_service.record_prediction(
+        predicted_class, confidence, model_version, confidence < EXPECTED_ACCURACY, cached
+    )
+
+async def classify_image_with_version(processed_image):
+    """Classify the processed image and report which model version produced the result."""
+    if inference_pool is None:
         logger.error("Model not loaded")
-        raise ValueError("Model not loaded")
+        raise ModelNotReadyError("Model not loaded")
     
     try:
         if len(processed_image.shape) != 4:
             logger.error("Processed image does not have the correct batch dimension.")
             raise ValueError("Processed image must have a batch dimension.")
         
-        predictions = model.predict(processed_image)
+        model_version, predictions = await inference_batcher.submit(processed_image)
         predicted_class = np.argmax(predictions, axis=-1)
         confidence = np.max(predictions, axis=-1)
         
         predicted_class_name = FEATURE_NAMES[predicted_class[0]] if predicted_class[0] < len(FEATURE_NAMES) else "Unknown"
-        logger.info(f"Predicted class: {predicted_class_name}, Confidence: {confidence[0]:.2f}")
+        logger.debug("Predicted class: %s, Confidence: %.2f", predicted_class_name, confidence[0])
         
         # Check if the confidence meets the expected accuracy
         if confidence[0] < EXPECTED_ACCURACY:
-            logger.warning(f"Prediction confidence {confidence[0]:.2f} is below the expected accuracy threshold {EXPECTED_ACCURACY:.2f}")
+            logger.warning("Prediction confidence %.2f is below the expected accuracy threshold %.2f",
+                           confidence[0], EXPECTED_ACCURACY)
         
-        return predicted_class_name, float(confidence[0])
+        return predicted_class_name, float(confidence[0]), model_version
     except Exception as e:
-        logger.error(f"Failed to classify image: {e}")
+        logger.error("Failed to classify image: %s", e)
         raise
 
-async def save_classification(classification):
-    """Save the classification result to the database."""
+async def lookup_cached_prediction(contents):
+    """Look up an encoded upload in the prediction cache under the serving model version.
+
+    Returns ``(cache_key, serving_version, cached)`` where ``cached`` is the
+    stored ``[predicted_class, confidence]`` or None on a miss.
+    """
+    serving_version = model_registry.serving.version
+    cache_key = prediction_cache.make_key(contents, serving_version)
+    return cache_key, serving_version, await prediction_cache.get(cache_key)
+
+async def cache_prediction(contents, cache_key, cache_version, model_version, predicted_class, confidence):
+    """Store a fresh prediction under the key from lookup_cached_prediction.
+
+    If the serving model was swapped while the upload was queued, the result
+    is stored under the version that actually produced it instead.
+    """
+    if model_version != cache_version:
+        cache_key = prediction_cache.make_key(contents, model_version)
+    await prediction_cache.set(cache_key, [predicted_class, confidence])
+
+def _label_predictions(predictions):
+    """Turn a batch of raw model outputs into (class name, confidence) pairs."""
+    predicted_classes = np.argmax(predictions, axis=-1)
+    confidences = np.max(predictions, axis=-1)
+    results = []
+    for predicted_class, confidence in zip(predicted_classes, confidences):
+        predicted_class_name = FEATURE_NAMES[predicted_class] if predicted_class < len(FEATURE_NAMES) else "Unknown"
+        if confidence < EXPECTED_ACCURACY:
+            logger.warning("Prediction confidence %.2f is below the expected accuracy threshold %.2f",
+                           confidence, EXPECTED_ACCURACY)
+        results.append((predicted_class_name, float(confidence)))
+    return results
+
+def _timed_decode(contents):
+    with metrics_service.stage_timer("decode"):
+        return decode_image(contents, IMG_SIZE)
+
+async def classify_uploads(uploads):
+    """Classify many encoded uploads with a single batched model call.
+
+    Cache hits are yielded first, then images are decoded in parallel and
+    every remaining image is classified in one batch. Yields
+    ``(index, result, error)`` tuples as soon as each outcome is known, where
+    ``result`` is a ``(predicted_class, confidence, model_version)`` tuple or None.
+    """
+    cache_keys, misses = {}, []
+    for index, contents in enumerate(uploads):
+        cache_key, serving_version, cached = await lookup_cached_prediction(contents)
+        cache_keys[index] = (cache_key, serving_version)
+        if cached is not None:
+            record_prediction(*cached, serving_version, cached=True)
+            yield index, (*cached, serving_version), None
+        else:
+            misses.append(index)
+    if not misses:
+        return
+
+    decoded = await asyncio.gather(
+        *[asyncio.to_thread(_timed_decode, uploads[index]) for index in misses],
+        return_exceptions=True,
+    )
+    ready = []
+    for index, image in zip(misses, decoded):
+        if isinstance(image, Exception):
+            logger.error("Failed to decode image %s of batch: %s", index, image)
+            yield index, None, "Invalid image"
+        else:
+            ready.append((index, image))
+    if not ready:
+        return
+
+    with metrics_service.stage_timer("preprocess"):
+        processed_images = await asyncio.to_thread(preprocess_batch, [image for _, image in ready], IMG_SIZE)
     try:
-        await add_classification(
-            classification.user_id,
-            classification.image_name,
-            classification.predicted_class,
-            classification.confidence
-        )
-        logger.info(f"Classification saved for user_id {classification.user_id}")
+        model_version, predictions = await inference_batcher.submit(processed_images)
     except Exception as e:
-        logger.error(f"Failed to save classification: {e}")
-        raise
+        logger.error("Failed to classify batch of %s images: %s", len(ready), e)
+        if isinstance(e, ExecutorOverloadedError):
+            error = BUSY_ERROR
+        elif isinstance(e, ModelNotReadyError):
+            error = LOADING_ERROR
+        else:
+            error = "Prediction failed"
+        for index, _ in ready:
+            yield index, None, error
+        return
+
+    results = _label_predictions(predictions)
+    logger.info("Classified batch of %s images", len(results))
+    for (index, _), result in zip(ready, results):
+        await cache_prediction(uploads[index], *cache_keys[index], model_version, *result)
+        record_prediction(*result, model_version)
+        yield index, (*result, model_version), None
+
+def _classification_row(classification):
+    return {
+        "user_id": classification.user_id,
+        "image_name": classification.image_name,
+        "predicted_class": classification.predicted_class,
+        "confidence": classification.confidence,
+        "timestamp": datetime.utcnow(),
+        "model_version": classification.model_version,
+    }
+
+async def save_classification(classification):
+    """Queue the classification result for the next bulk write to the database."""
+    classification_writer.add(_classification_row(classification))
 
-async def get_user_classifications(user_id):
-    """Retrieve classification history for a user."""
+async def get_user_classifications(user_id, **filters):
+    """Retrieve classification history for a user; see database.get_user_classifications for filters."""
     try:
-        classifications = await db_get_user_classifications(user_id)
-        logger.info(f"Retrieved {len(classifications)} classifications for user_id {user_id}")
+        classifications = await db_get_user_classifications(user_id, **filters)
+        logger.info("Retrieved %s classifications for user_id %s", len(classifications), user_id)
         return classifications
     except Exception as e:
-        logger.error(f"Failed to retrieve classifications: {e}")
+        logger.error("Failed to retrieve classifications: %s", e)
         raise
@@ -1,11 +1,17 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import select, delete, func, text, inspect, and_, or_, Column, Integer, String, Float, DateTime, Date, ForeignKey, Index, Boolean
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
-from typing import List, Dict
+from datetime import datetime, date, timezone
+from bisect import bisect_right
+from typing import List, Dict, Optional, Tuple
+import base64
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import time
 import logging
 
 # Load environment variables
@@ -13,7 +19,6 @@ load_dotenv()
 
 # Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Database configuration
 DB_USERNAME = os.getenv('DB_USERNAME', 'postgres')
@@ -22,12 +27,100 @@ DB_HOSTNAME = os.getenv('DB_HOSTNAME', 'db')
 DB_PORT = os.getenv('DB_PORT', '5432')
 DB_NAME = os.getenv('DB_NAME', 'aimlgroup6')
 
-DB_URL = f"postgresql+asyncpg://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}"
+DB_URL = os.getenv('DATABASE_URL', f"postgresql+asyncpg://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}")
+
+# Connection pool and logging configuration
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() in ('1', 'true', 'yes')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))
+
+class PoolStats:
+    """Counters for connection checkouts from the pool, including time spent waiting."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait_seconds, timed_out=False):
+        self.checkouts += 1
+        self.timeouts += int(timed_out)
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+pool_stats = PoolStats()
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+def create_db_engine(url=DB_URL, **overrides):
+    """Create the async engine using the configured pool, echo and statement cache settings."""
+    options = {}
+    if DB_ECHO:
+        # Through the logging queue like everything else, instead of echo=True's own stdout handler
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    if url.startswith("postgresql"):
+        options.update(
+            poolclass=InstrumentedAsyncPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+        )
+    options.update(overrides)
+    return create_async_engine(url, **options)
 
 # Create async engine and session
-engine = create_async_engine(DB_URL, echo=True)
+engine = create_db_engine()
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+async def configure_engine(url=DB_URL, **overrides):
+    """Replace the engine (e.g. with different pool settings) and dispose of the old one."""
+    global engine, AsyncSessionLocal
+    old_engine = engine
+    engine = create_db_engine(url, **overrides)
+    AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    pool_stats.reset()
+    await old_engine.dispose()
+
+def get_pool_stats() -> Dict:
+    """Return connection pool usage: checked-out connections, overflow and checkout wait times."""
+    pool = engine.pool
+    stats = {
+        "checkouts": pool_stats.checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_ms_avg": pool_stats.wait_seconds_total / pool_stats.checkouts * 1000 if pool_stats.checkouts else 0.0,
+        "wait_ms_max": pool_stats.wait_seconds_max * 1000,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    return stats
+
 # Create Base class
 Base = declarative_base()
 
@@ -45,6 +138,10 @@ class Classification(Base):
     predicted_class = Column(String)
     confidence = Column(Float)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    model_version = Column(String)
+
+    # Serves per-user history in time order and keyset pagination on (timestamp, id)
+    __table_args__ = (Index('ix_classifications_user_id_timestamp', 'user_id', 'timestamp'),)
 
     def to_dict(self) -> Dict:
         return {
@@ -53,15 +150,117 @@ class Classification(Base):
             "image_name": self.image_name,
             "predicted_class": self.predicted_class,
             "confidence": self.confidence,
-            "timestamp": self.timestamp.isoformat() if self.timestamp else None
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "model_version": self.model_version
         }
 
+class Feedback(Base):
+    __tablename__ = "feedback"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    classification_id = Column(Integer, ForeignKey('classifications.id'))
+    feedback_text = Column(String)
+    is_correct = Column(Boolean)  # Null when the user gave no verdict on the prediction
+    corrected_class = Column(String)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_feedback_classification_id', 'classification_id'),
+        Index('ix_feedback_user_id_timestamp', 'user_id', 'timestamp'),
+    )
+
+class FeedbackAggregate(Base):
+    """Running feedback counts per model version and predicted class, updated with every feedback insert."""
+    __tablename__ = "feedback_aggregates"
+    model_version = Column(String, primary_key=True)  # '' for classifications made before versions were recorded
+    predicted_class = Column(String, primary_key=True)
+    agree_count = Column(Integer, nullable=False, default=0)
+    disagree_count = Column(Integer, nullable=False, default=0)
+    unrated_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Classification rollups below are kept per user and, under this user_id, for all users together
+ALL_USERS = 0
+CONFIDENCE_BUCKETS = 10  # Confidence histogram bins of width 0.1; 1.0 falls in the top bin
+_CONFIDENCE_BUCKET_EDGES = [bucket / CONFIDENCE_BUCKETS for bucket in range(1, CONFIDENCE_BUCKETS)]
+
+class ClassificationStat(Base):
+    """Running classification counts per user, predicted class and confidence bucket, updated with every insert."""
+    __tablename__ = "classification_stats"
+    user_id = Column(Integer, primary_key=True)  # ALL_USERS for the clinic-wide totals
+    predicted_class = Column(String, primary_key=True)
+    confidence_bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ClassificationDailyStat(Base):
+    """Running classification counts per user, UTC day and predicted class, updated with every insert."""
+    __tablename__ = "classification_daily_stats"
+    user_id = Column(Integer, primary_key=True)  # ALL_USERS for the clinic-wide totals
+    day = Column(Date, primary_key=True)
+    predicted_class = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class BulkLoadChunk(Base):
+    """Chunks of a bulk load already copied into classifications, recorded in the same transaction as the copy."""
+    __tablename__ = "bulk_load_chunks"
+    run_id = Column(String, primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    images = Column(Integer, nullable=False)
+    failed = Column(Integer, nullable=False)
+    loaded_at = Column(DateTime, default=datetime.utcnow)
+
 # Create tables
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         logger.info("Database initialized successfully")
 
+def _migrate(connection) -> List[str]:
+    existing_tables = set(inspect(connection).get_table_names())
+    Base.metadata.create_all(connection)  # Tables that do not exist yet, with their indexes
+    inspector = inspect(connection)
+    changes = [f"created table {table.name}" for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"{table.name}.{column.name} is NOT NULL and cannot be added automatically")
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            changes.append(f"added column {table.name}.{column.name}")
+        # Any existing index or constraint on the same columns already serves, e.g. init.sql's UNIQUE(username)
+        covered = [tuple(table.primary_key.columns.keys())]
+        covered += [tuple(index["column_names"]) for index in inspector.get_indexes(table.name)]
+        covered += [tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(table.name)]
+        for index in table.indexes:
+            if tuple(index.columns.keys()) in covered:
+                continue
+            index.create(connection)
+            changes.append(f"created index {index.name}")
+    return changes
+
+async def migrate_db() -> List[str]:
+    """Bring an existing database up to the schema of the models above and return what was changed.
+
+    Creates missing tables, adds missing (nullable) columns and creates
+    missing indexes. Changes are only ever additive, so running it against
+    an up-to-date database does nothing.
+    """
+    async with engine.begin() as conn:
+        changes = await conn.run_sync(_migrate)
+    for change in changes:
+        logger.info("Migration: %s", change)
+    logger.info("Database schema is up to date (%s changes)", len(changes))
+    return changes
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
@@ -69,10 +268,10 @@ async def get_db():
 async def get_user(username: str) -> User:
     try:
         async with AsyncSessionLocal() as session:
-            result = await session.execute(User.__table__.select().where(User.username == username))
+            result = await session.execute(select(User).where(User.username == username))
             return result.scalar_one_or_none()
     except Exception as e:
-        logger.error(f"Error fetching user {username}: {e}")
+        logger.error("Error fetching user %s: %s", username, e)
         raise
 
 async def create_user(username: str, hashed_password: str) -> User:
@@ -82,10 +281,10 @@ async def create_user(username: str, hashed_password: str) -> User:
             session.add(db_user)
             await session.commit()
             await session.refresh(db_user)
-            logger.info(f"User {username} created successfully")
+            logger.info("User %s created successfully", username)
             return db_user
     except Exception as e:
-        logger.error(f"Error creating user {username}: {e}")
+        logger.error("Error creating user %s: %s", username, e)
         await session.rollback()  # Ensure rollback in case of error
         raise
 
@@ -96,25 +295,380 @@ async def add_classification(user_id: int, image_name: str, predicted_class: str
                 user_id=user_id,
                 image_name=image_name,
                 predicted_class=predicted_class,
-                confidence=confidence
+                confidence=confidence,
+                timestamp=datetime.utcnow()
             )
             session.add(db_classification)
+            # Insert the row before touching the rollups, so every writer locks classifications first
+            await session.flush()  # The new id comes back via INSERT ... RETURNING, no refresh needed
+            await add_to_classification_stats(session, [{
+                "user_id": user_id, "predicted_class": predicted_class,
+                "confidence": confidence, "timestamp": db_classification.timestamp,
+            }])
             await session.commit()
-            await session.refresh(db_classification)
-            logger.info(f"Classification for user_id {user_id} added successfully")
+            logger.info("Classification for user_id %s added successfully", user_id)
             return db_classification
     except Exception as e:
-        logger.error(f"Error adding classification for user_id {user_id}: {e}")
+        logger.error("Error adding classification for user_id %s: %s", user_id, e)
         await session.rollback()
         raise
 
-async def get_user_classifications(user_id: int) -> List[Dict]:
+async def add_classifications(rows: List[Dict]) -> int:
+    """Insert many classification rows with a single multi-row INSERT and update the rollups with them."""
+    if not rows:
+        return 0
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(Classification.__table__.insert().values(rows))
+            await add_to_classification_stats(session, rows)
+            await session.commit()
+            logger.info("Added %s classifications in bulk", len(rows))
+            return len(rows)
+    except Exception as e:
+        logger.error("Error adding %s classifications in bulk: %s", len(rows), e)
+        raise
+
+CLASSIFICATION_COPY_COLUMNS = ("user_id", "image_name", "predicted_class", "confidence", "timestamp", "model_version")
+
+async def copy_classifications(rows: List[Dict], load_chunk: Optional[Dict] = None) -> int:
+    """Bulk load classification rows with COPY on PostgreSQL; other databases get a multi-row INSERT.
+
+    With ``load_chunk`` (run_id, chunk_index, images, failed) the chunk is
+    recorded in bulk_load_chunks in the same transaction, so a resumed load
+    can tell exactly which chunks were committed.
+    """
+    if not rows:
+        return 0
+    try:
+        async with engine.begin() as connection:
+            # Rows first, then the rollups, the same lock order as every other writer
+            if engine.dialect.name != "postgresql" or engine.dialect.driver != "asyncpg":
+                await connection.execute(Classification.__table__.insert().values(rows))
+            else:
+                # asyncpg only starts the transaction with the first statement run through SQLAlchemy;
+                # taking the lock COPY needs that way keeps the raw COPY inside this transaction
+                await connection.execute(text(f"LOCK TABLE {Classification.__tablename__} IN ROW EXCLUSIVE MODE"))
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    Classification.__tablename__,
+                    records=[tuple(row[column] for column in CLASSIFICATION_COPY_COLUMNS) for row in rows],
+                    columns=CLASSIFICATION_COPY_COLUMNS,
+                )
+            if load_chunk is not None:
+                await connection.execute(BulkLoadChunk.__table__.insert().values(load_chunk))
+            await add_to_classification_stats(connection, rows)
+            logger.info("Copied %s classifications", len(rows))
+            return len(rows)
+    except Exception as e:
+        logger.error("Error copying %s classifications: %s", len(rows), e)
+        raise
+
+async def get_loaded_chunks(run_id: str) -> Dict[int, Tuple[int, int]]:
+    """Return ``{chunk_index: (images, failed)}`` for the chunks of a bulk load already committed."""
+    chunks = BulkLoadChunk.__table__
+    query = select(chunks.c.chunk_index, chunks.c.images, chunks.c.failed).where(chunks.c.run_id == run_id)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return {row.chunk_index: (row.images, row.failed) for row in result}
+
+async def clear_loaded_chunks(run_id: str):
+    """Forget which chunks of a bulk load were committed, so the whole load runs again."""
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(BulkLoadChunk.__table__).where(BulkLoadChunk.__table__.c.run_id == run_id))
+        await session.commit()
+
+def _confidence_bucket(confidence: float) -> int:
+    return bisect_right(_CONFIDENCE_BUCKET_EDGES, confidence)
+
+async def _upsert_counts(connection, table, keys: List[str], deltas: Dict[Tuple, List], now: datetime):
+    statement = _upsert(table).values([
+        {**dict(zip(keys, key)), "count": count, "confidence_sum": confidence_sum, "updated_at": now}
+        # In key order, so concurrent writers lock the shared rows in the same order and cannot deadlock
+        for key, (count, confidence_sum) in sorted(deltas.items())
+    ])
+    await connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={
+            "count": table.c.count + statement.excluded.count,
+            "confidence_sum": table.c.confidence_sum + statement.excluded.confidence_sum,
+            "updated_at": statement.excluded.updated_at,
+        },
+    ))
+
+async def add_to_classification_stats(connection, rows: List[Dict]):
+    """Add classification rows to classification_stats and classification_daily_stats.
+
+    Runs on the caller's session or connection, so the rollups commit or
+    roll back together with the rows. Each row counts for its user and for
+    ALL_USERS; rows without a timestamp count as today.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    totals, daily = {}, {}
+    for row in rows:
+        confidence = float(row["confidence"])
+        day = (_naive_utc(row.get("timestamp")) or now).date()
+        bucket = _confidence_bucket(confidence)
+        user_ids = (row["user_id"], ALL_USERS) if row.get("user_id") is not None else (ALL_USERS,)
+        for user_id in user_ids:
+            for counts in (totals.setdefault((user_id, row["predicted_class"], bucket), [0, 0.0]),
+                           daily.setdefault((user_id, day, row["predicted_class"]), [0, 0.0])):
+                counts[0] += 1
+                counts[1] += confidence
+    # Add to the running totals instead of recounting the classifications table
+    await _upsert_counts(connection, ClassificationStat.__table__,
+                         ["user_id", "predicted_class", "confidence_bucket"], totals, now)
+    await _upsert_counts(connection, ClassificationDailyStat.__table__,
+                         ["user_id", "day", "predicted_class"], daily, now)
+
+async def clear_classification_stats() -> int:
+    """Empty both rollup tables and return the highest classification id at that moment.
+
+    Classifications inserted afterwards are counted by the write path; the
+    ones up to the returned id are left for backfill_classification_stats.
+    Inserts wait while this runs, so no classification at or below the
+    returned id can commit after the rollups are emptied and be counted twice.
+    """
+    async with AsyncSessionLocal() as session:
+        if engine.dialect.name == "postgresql":
+            # SHARE conflicts with the ROW EXCLUSIVE lock every INSERT and COPY takes: in-flight writers
+            # commit first and new ones wait for this transaction, which is then the only one to clear
+            await session.execute(text(f"LOCK TABLE {Classification.__tablename__} IN SHARE MODE"))
+        # On SQLite the DELETE takes the database write lock, which serializes writers the same way
+        await session.execute(delete(ClassificationStat.__table__))
+        await session.execute(delete(ClassificationDailyStat.__table__))
+        high_water = (await session.execute(select(func.max(Classification.id)))).scalar()
+        await session.commit()
+        logger.info("Cleared classification rollups up to classification id %s", high_water)
+        return high_water or 0
+
+async def backfill_classification_stats(after_id: int, up_to_id: int, limit: int) -> Tuple[int, int]:
+    """Add the next ``limit`` classifications with after_id < id <= up_to_id to the rollups.
+
+    Returns the number of rows added and the last id added, for the next call.
+    """
+    table = Classification.__table__
+    query = (
+        select(table.c.id, table.c.user_id, table.c.predicted_class, table.c.confidence, table.c.timestamp)
+        .where(and_(table.c.id > after_id, table.c.id <= up_to_id))
+        .order_by(table.c.id)
+        .limit(limit)
+    )
+    async with AsyncSessionLocal() as session:
+        rows = [dict(row._mapping) for row in await session.execute(query)]
+        # Rows written before predicted_class or confidence were required have nothing to count
+        counted = [row for row in rows if row["predicted_class"] is not None and row["confidence"] is not None]
+        await add_to_classification_stats(session, counted)
+        await session.commit()
+    return len(rows), rows[-1]["id"] if rows else up_to_id
+
+async def get_classification_stats(user_id: int = ALL_USERS) -> List[Dict]:
+    """Return the rollup rows (predicted class, confidence bucket, count, confidence sum) of a user or ALL_USERS."""
+    stats = ClassificationStat.__table__
+    query = (
+        select(stats.c.predicted_class, stats.c.confidence_bucket, stats.c.count, stats.c.confidence_sum)
+        .where(stats.c.user_id == user_id)
+        .order_by(stats.c.predicted_class, stats.c.confidence_bucket)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return [dict(row._mapping) for row in result]
+
+async def get_classification_daily_stats(user_id: int = ALL_USERS, start: Optional[date] = None,
+                                         end: Optional[date] = None) -> List[Dict]:
+    """Return the per-day, per-class rollup rows of a user or ALL_USERS between start and end (inclusive)."""
+    daily = ClassificationDailyStat.__table__
+    query = (
+        select(daily.c.day, daily.c.predicted_class, daily.c.count, daily.c.confidence_sum)
+        .where(daily.c.user_id == user_id)
+        .order_by(daily.c.day, daily.c.predicted_class)
+    )
+    if start is not None:
+        query = query.where(daily.c.day >= start)
+    if end is not None:
+        query = query.where(daily.c.day <= end)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return [dict(row._mapping) for row in result]
+
+async def get_classification(classification_id: int) -> Optional[Dict]:
+    """Return one classification row as a dict, or None if it does not exist."""
+    table = Classification.__table__
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(table).where(table.c.id == classification_id))
+        row = result.first()
+        return dict(row._mapping) if row is not None else None
+
+async def get_classification_owner(classification_id: int) -> Optional[int]:
+    """Return the user_id a classification belongs to, or None if it does not exist."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Classification.user_id).where(Classification.id == classification_id))
+        row = result.first()
+        return row.user_id if row is not None else None
+
+def _upsert(table):
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {engine.dialect.name}")
+
+async def add_feedback(rows: List[Dict]) -> int:
+    """Insert many feedback rows and fold them into feedback_aggregates in the same transaction.
+
+    Each row's verdict is taken from ``is_correct``, or else from comparing
+    ``corrected_class`` with the predicted class. Rows for classifications
+    that no longer exist are dropped.
+    """
+    if not rows:
+        return 0
+    try:
+        async with AsyncSessionLocal() as session:
+            classifications = Classification.__table__
+            result = await session.execute(
+                select(classifications.c.id, classifications.c.predicted_class, classifications.c.model_version)
+                .where(classifications.c.id.in_({row["classification_id"] for row in rows}))
+            )
+            predictions = {row.id: row for row in result}
+            kept, deltas = [], {}
+            for row in rows:
+                prediction = predictions.get(row["classification_id"])
+                if prediction is None:
+                    logger.warning("Dropping feedback for missing classification %s", row["classification_id"])
+                    continue
+                row = dict(row)
+                if row.get("is_correct") is None and row.get("corrected_class"):
+                    row["is_correct"] = row["corrected_class"] == prediction.predicted_class
+                kept.append(row)
+                counts = deltas.setdefault((prediction.model_version or "", prediction.predicted_class), [0, 0, 0])
+                if row.get("is_correct") is None:
+                    counts[2] += 1
+                elif row["is_correct"]:
+                    counts[0] += 1
+                else:
+                    counts[1] += 1
+            if not kept:
+                return 0
+            await session.execute(Feedback.__table__.insert().values(kept))
+
+            aggregates = FeedbackAggregate.__table__
+            now = datetime.utcnow()
+            statement = _upsert(aggregates).values([
+                {"model_version": model_version, "predicted_class": predicted_class, "agree_count": agree,
+                 "disagree_count": disagree, "unrated_count": unrated, "updated_at": now}
+                for (model_version, predicted_class), (agree, disagree, unrated) in deltas.items()
+            ])
+            # Add to the running totals instead of recounting the feedback table
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=[aggregates.c.model_version, aggregates.c.predicted_class],
+                set_={
+                    "agree_count": aggregates.c.agree_count + statement.excluded.agree_count,
+                    "disagree_count": aggregates.c.disagree_count + statement.excluded.disagree_count,
+                    "unrated_count": aggregates.c.unrated_count + statement.excluded.unrated_count,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            ))
+            await session.commit()
+            logger.info("Added %s feedback rows in bulk", len(kept))
+            return len(kept)
+    except Exception as e:
+        logger.error("Error adding %s feedback rows in bulk: %s", len(rows), e)
+        raise
+
+async def get_feedback_aggregates(model_version: Optional[str] = None) -> List[Dict]:
+    """Return the running agree/disagree counts per model version and predicted class."""
+    query = select(FeedbackAggregate).order_by(FeedbackAggregate.model_version, FeedbackAggregate.predicted_class)
+    if model_version is not None:
+        query = query.where(FeedbackAggregate.model_version == model_version)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return [
+            {
+                "model_version": aggregate.model_version or None,
+                "predicted_class": aggregate.predicted_class,
+                "agree_count": aggregate.agree_count,
+                "disagree_count": aggregate.disagree_count,
+                "unrated_count": aggregate.unrated_count,
+                "updated_at": aggregate.updated_at.isoformat() if aggregate.updated_at else None,
+            }
+            for aggregate in result.scalars()
+        ]
+
+def _classification_row_to_dict(row) -> Dict:
+    timestamp = row.timestamp
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "image_name": row.image_name,
+        "predicted_class": row.predicted_class,
+        "confidence": row.confidence,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+        "model_version": row.model_version
+    }
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def encode_cursor(row: Dict) -> str:
+    """Build an opaque pagination cursor pointing just past ``row``."""
+    return base64.urlsafe_b64encode(f"{row['timestamp']}|{row['id']}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from encode_cursor; raises ValueError if it is malformed."""
     try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _user_classifications_query(user_id: int, cursor: Optional[Tuple[datetime, int]] = None,
+                                start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                predicted_class: Optional[str] = None):
+    table = Classification.__table__
+    query = select(
+        table.c.id, table.c.user_id, table.c.image_name, table.c.predicted_class,
+        table.c.confidence, table.c.timestamp, table.c.model_version
+    ).where(table.c.user_id == user_id)
+    if start is not None:
+        query = query.where(table.c.timestamp >= _naive_utc(start))
+    if end is not None:
+        query = query.where(table.c.timestamp < _naive_utc(end))
+    if predicted_class is not None:
+        query = query.where(table.c.predicted_class == predicted_class)
+    if cursor is not None:
+        cursor_timestamp, cursor_id = cursor
+        query = query.where(or_(
+            table.c.timestamp < cursor_timestamp,
+            and_(table.c.timestamp == cursor_timestamp, table.c.id < cursor_id)
+        ))
+    return query.order_by(table.c.timestamp.desc(), table.c.id.desc())
+
+async def get_user_classifications(user_id: int, limit: Optional[int] = None,
+                                   cursor: Optional[Tuple[datetime, int]] = None,
+                                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                   predicted_class: Optional[str] = None) -> List[Dict]:
+    """Return a user's classifications, newest first, one keyset page at a time."""
+    try:
+        query = _user_classifications_query(user_id, cursor, start, end, predicted_class)
+        if limit is not None:
+            query = query.limit(limit)
         async with AsyncSessionLocal() as session:
-            result = await session.execute(Classification.__table__.select().where(Classification.user_id == user_id))
-            classifications = result.fetchall()
-            logger.info(f"Retrieved {len(classifications)} classifications for user_id {user_id}")
-            return [Classification(**dict(row)).to_dict() for row in classifications]
+            result = await session.execute(query)
+            classifications = [_classification_row_to_dict(row) for row in result]
+            logger.info("Retrieved %s classifications for user_id %s", len(classifications), user_id)
+            return classifications
     except Exception as e:
-        logger.error(f"Error retrieving classifications for user_id {user_id}: {e}")
+        logger.error("Error retrieving classifications for user_id %s: %s", user_id, e)
         raise
+
+async def stream_user_classifications(user_id: int, start: Optional[datetime] = None,
+                                      end: Optional[datetime] = None, predicted_class: Optional[str] = None):
+    """Yield every matching classification, newest first, through a server-side cursor."""
+    query = _user_classifications_query(user_id, None, start, end, predicted_class)
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=1000))
+        async for row in result:
+            yield _classification_row_to_dict(row)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """Raised when a worker pool's admission queue is full and new work must be rejected."""
+
+
+class BoundedExecutor:
+    """Thread or process worker pool with a bounded admission queue.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more may
+    wait for a worker. Anything beyond that is rejected immediately with
+    ``ExecutorOverloadedError`` instead of piling up.
+    """
+
+    def __init__(self, name, kind="thread", max_workers=1, max_queue=0, initializer=None, initargs=()):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+        if kind == "process":
+            # TensorFlow is not fork-safe, so worker processes are always spawned
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=name,
+                initializer=initializer,
+                initargs=initargs,
+            )
+        logger.info("%s executor started (%s, workers=%s, queue=%s)", name, kind, self.max_workers, self.max_queue)
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def idle_workers(self):
+        return max(0, self.max_workers - self._pending)
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` on a worker, rejecting it if the admission queue is full."""
+        if self._pending >= self.capacity:
+            self._rejected += 1
+            raise ExecutorOverloadedError(f"{self.name} executor is at capacity ({self.capacity} pending jobs)")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self._completed += 1
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("%s executor shut down", self.name)
+
+    def stats(self):
+        """Return worker, queue depth and rejection metrics."""
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "queue_depth": max(0, self._pending - self.max_workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
@@ -1,10 +1,59 @@
-from .database import add_feedback
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from .database import add_feedback, get_classification_owner, get_feedback_aggregates
+from .persistence_service import WriteBehindBuffer
 from .logging_service import log_info, log_error
 
-async def save_feedback(user_id, classification_id, feedback_text):
+# Load environment variables
+load_dotenv()
+
+# Feedback write-behind configuration
+FEEDBACK_FLUSH_ROWS = int(os.getenv('FEEDBACK_FLUSH_ROWS', '200'))
+FEEDBACK_FLUSH_INTERVAL_MS = int(os.getenv('FEEDBACK_FLUSH_INTERVAL_MS', '1000'))
+FEEDBACK_BUFFER_MAX_ROWS = int(os.getenv('FEEDBACK_BUFFER_MAX_ROWS', '10000'))
+FEEDBACK_MAX_TEXT_LENGTH = int(os.getenv('FEEDBACK_MAX_TEXT_LENGTH', '2000'))
+
+class FeedbackNotFoundError(LookupError):
+    """Raised when feedback refers to a classification that does not exist or belongs to another user."""
+
+# Feedback rows are buffered here and written, together with their aggregate updates, in bulk
+feedback_writer = WriteBehindBuffer(
+    "feedback",
+    add_feedback,
+    flush_rows=FEEDBACK_FLUSH_ROWS,
+    flush_interval_ms=FEEDBACK_FLUSH_INTERVAL_MS,
+    max_buffered_rows=FEEDBACK_BUFFER_MAX_ROWS,
+)
+
+async def save_feedback(user_id, classification_id, feedback_text, is_correct=None, corrected_class=None,
+                        valid_classes=None):
+    """Validate feedback on one of the user's classifications and queue it for the next bulk write."""
+    if feedback_text is not None and len(feedback_text) > FEEDBACK_MAX_TEXT_LENGTH:
+        raise ValueError(f"Feedback text is longer than {FEEDBACK_MAX_TEXT_LENGTH} characters")
+    if corrected_class is not None and valid_classes is not None and corrected_class not in valid_classes:
+        raise ValueError(f"Unknown class {corrected_class}, expected one of {', '.join(valid_classes)}")
     try:
-        await add_feedback(user_id, classification_id, feedback_text)
-        log_info(f"Feedback saved for user_id {user_id}, classification_id {classification_id}")
+        owner = await get_classification_owner(classification_id)
     except Exception as e:
-        log_error(f"Failed to save feedback: {e}")
+        log_error("Failed to look up classification %s for feedback: %s", classification_id, e)
         raise
+    if owner != user_id:
+        raise FeedbackNotFoundError(f"Classification {classification_id} not found")
+    feedback_writer.add({
+        "user_id": user_id,
+        "classification_id": classification_id,
+        "feedback_text": feedback_text,
+        "is_correct": is_correct,
+        "corrected_class": corrected_class,
+        "timestamp": datetime.utcnow(),
+    })
+    log_info("Feedback queued for user_id %s, classification_id %s", user_id, classification_id)
+
+async def get_feedback_summary(model_version=None):
+    """Per-class agreement with the model, read from the incrementally maintained aggregate table."""
+    summary = await get_feedback_aggregates(model_version)
+    for row in summary:
+        rated = row["agree_count"] + row["disagree_count"]
+        row["agreement_rate"] = row["agree_count"] / rated if rated else None
+    return summary
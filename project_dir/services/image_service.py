@@ -1,34 +1,242 @@
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import io
+import os
+import zipfile
 import numpy as np
+from dotenv import load_dotenv
 
-async def process_upload(file):
+# Load environment variables
+load_dotenv()
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+IMAGE_FORMATS = ('JPEG', 'PNG')
+
+# Upload limits
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.getenv('UPLOAD_MAX_PIXELS', str(40 * 1000 * 1000)))
+UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_BYTES', str(64 * 1024)))
+UPLOAD_SNIFF_BYTES = int(os.getenv('UPLOAD_SNIFF_BYTES', str(256 * 1024)))
+
+# PIL's own decompression bomb guard, for any image opened without going through read_image_upload
+Image.MAX_IMAGE_PIXELS = UPLOAD_MAX_PIXELS
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload is refused before it is fully read or decoded."""
+    status_code = 400
+
+class UploadTooLargeError(UploadRejectedError):
+    """The upload exceeds the byte limit or its image header declares too many pixels."""
+    status_code = 413
+
+class UnsupportedImageError(UploadRejectedError):
+    """The upload is not an image in one of IMAGE_FORMATS."""
+    status_code = 415
+
+def sniff_image(header):
     """
-    Asynchronously reads the uploaded file and opens it as an image using PIL.
+    Identifies an image from the first bytes of its file without decoding any pixels.
 
     Args:
-        file: The uploaded file to be processed.
+        header: A prefix of the encoded image.
 
     Returns:
-        image: A PIL image object.
+        info: A (format, width, height) tuple, or None if the prefix is too short to tell.
     """
-    contents = await file.read()  # Read the file contents asynchronously
-    image = Image.open(io.BytesIO(contents))  # Open the image from the byte stream
-    return image
+    try:
+        with Image.open(io.BytesIO(header)) as image:  # Parses the header only; pixels are decoded lazily
+            return image.format, image.width, image.height
+    except Image.DecompressionBombError as e:
+        raise UploadTooLargeError(str(e))
+    except (UnidentifiedImageError, SyntaxError, OSError, EOFError):
+        return None
 
-def preprocess_image(image, target_size=(224, 224)):
+def check_image_header(image_format, width, height, max_pixels=UPLOAD_MAX_PIXELS):
+    if image_format not in IMAGE_FORMATS:
+        raise UnsupportedImageError(f"Unsupported image format {image_format}, expected one of {', '.join(IMAGE_FORMATS)}")
+    if width * height > max_pixels:
+        raise UploadTooLargeError(f"Image is {width}x{height} pixels, the limit is {max_pixels} pixels")
+
+def _check_upload_size(file, max_bytes):
+    size = getattr(file, 'size', None)  # Known up front when the multipart parser spooled the part
+    if size is not None and size > max_bytes:
+        raise UploadTooLargeError(f"{file.filename} is {size} bytes, the limit is {max_bytes} bytes")
+
+async def read_upload(file, max_bytes=UPLOAD_MAX_BYTES, chunk_size=UPLOAD_CHUNK_BYTES):
     """
-    Synchronously preprocesses the image: resizing, normalizing, and expanding dimensions.
+    Asynchronously reads an uploaded file in chunks, stopping as soon as it exceeds max_bytes.
 
     Args:
-        image: A PIL image object to be preprocessed.
+        file: The uploaded file to be read.
+        max_bytes: The maximum accepted size of the file.
+        chunk_size: The number of bytes read per chunk.
+
+    Returns:
+        contents: The file contents as a bytearray.
+    """
+    _check_upload_size(file, max_bytes)
+    contents = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return contents
+        if len(contents) + len(chunk) > max_bytes:
+            raise UploadTooLargeError(f"{file.filename} exceeds the limit of {max_bytes} bytes")
+        contents += chunk
+
+async def read_image_upload(file, max_bytes=UPLOAD_MAX_BYTES, max_pixels=UPLOAD_MAX_PIXELS, chunk_size=UPLOAD_CHUNK_BYTES):
+    """
+    Asynchronously reads an uploaded image in chunks, checking its header before reading the rest.
+
+    The format and dimensions are taken from the image header as soon as
+    enough bytes have arrived, so unsupported files and decompression bombs
+    are rejected after the first chunk or two instead of after a full read
+    and decode.
+
+    Args:
+        file: The uploaded image to be read.
+        max_bytes: The maximum accepted size of the encoded file.
+        max_pixels: The maximum accepted width * height declared by the header.
+        chunk_size: The number of bytes read per chunk.
+
+    Returns:
+        contents: The encoded image as a bytearray.
+    """
+    _check_upload_size(file, max_bytes)
+    contents = bytearray()
+    sniffed = False
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if len(contents) + len(chunk) > max_bytes:
+            raise UploadTooLargeError(f"{file.filename} exceeds the limit of {max_bytes} bytes")
+        contents += chunk
+        if not sniffed:
+            info = sniff_image(contents)
+            if info is not None:
+                check_image_header(*info, max_pixels=max_pixels)
+                sniffed = True
+            elif len(contents) >= UPLOAD_SNIFF_BYTES:
+                raise UnsupportedImageError(f"{file.filename} is not a recognizable image")
+    if not sniffed:
+        info = sniff_image(contents)
+        if info is None:
+            raise UnsupportedImageError(f"{file.filename} is not a recognizable image")
+        check_image_header(*info, max_pixels=max_pixels)
+    return contents
+
+def decode_image(contents, target_size=(224, 224)):
+    """
+    Decodes image bytes directly to the target size and RGB mode.
+
+    JPEGs use draft mode so libjpeg decodes at a reduced DCT scale instead of
+    full resolution; other formats are shrunk with PIL's reducing resize.
+
+    Args:
+        contents: The raw bytes of an encoded image.
         target_size: A tuple indicating the target size for resizing the image.
 
     Returns:
-        image_array: A preprocessed numpy array ready for model prediction.
+        image: An RGB PIL image object of exactly target_size.
+    """
+    image = Image.open(io.BytesIO(contents))
+    check_image_header(image.format, image.width, image.height)  # Before any pixels are decoded
+    if image.format == 'JPEG':
+        image.draft('RGB', target_size)  # Decode at the smallest DCT scale still >= target_size
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.size != tuple(target_size):
+        image = image.resize(target_size, reducing_gap=2.0)
+    return image
+
+def preprocess_batch(images, target_size=(224, 224)):
+    """
+    Synchronously preprocesses a list of PIL images into one normalized batch.
+
+    Pixels are written straight into a preallocated float32 buffer and scaled
+    in place, so no per-image float copies are made.
+
+    Args:
+        images: PIL image objects to be preprocessed.
+        target_size: A tuple indicating the target size for resizing the images.
+
+    Returns:
+        batch: A contiguous float32 numpy array of shape (N, height, width, 3).
+    """
+    width, height = target_size
+    batch = np.empty((len(images), height, width, 3), dtype=np.float32)
+    for i, image in enumerate(images):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != tuple(target_size):
+            image = image.resize(target_size, reducing_gap=2.0)
+        batch[i] = np.asarray(image)  # uint8 -> float32 cast into the batch slot
+    np.multiply(batch, 1.0 / 255.0, out=batch)  # Normalize the whole batch in place
+    return batch
+
+def preprocess_bytes(contents, target_size=(224, 224)):
+    """
+    Synchronously decodes and preprocesses a list of encoded images into one batch.
+
+    Args:
+        contents: The raw bytes of each encoded image.
+        target_size: A tuple indicating the target size for resizing the images.
+
+    Returns:
+        batch: A contiguous float32 numpy array of shape (N, height, width, 3).
+    """
+    return preprocess_batch([decode_image(data, target_size) for data in contents], target_size)
+
+def decode_files(paths, target_size=(224, 224)):
+    """
+    Synchronously reads and decodes image files into one uint8 batch, for use in a process pool.
+
+    Pixels stay uint8 so only a quarter of the float32 batch crosses the
+    process boundary; scale by 1/255 as preprocess_batch does before inference.
+
+    Args:
+        paths: The image file paths to be decoded.
+        target_size: A tuple indicating the target size for resizing the images.
+
+    Returns:
+        pixels: A uint8 numpy array of shape (N, height, width, 3) for the decoded images.
+        decoded: The indexes into paths of the rows in pixels.
+        errors: A list of (index, message) tuples for files that could not be decoded.
+    """
+    width, height = target_size
+    pixels = np.empty((len(paths), height, width, 3), dtype=np.uint8)
+    decoded, errors = [], []
+    for index, path in enumerate(paths):
+        try:
+            with open(path, 'rb') as f:
+                pixels[len(decoded)] = np.asarray(decode_image(f.read(), target_size))
+            decoded.append(index)
+        except Exception as e:
+            errors.append((index, f"{type(e).__name__}: {e}"))
+    return pixels[:len(decoded)], decoded, errors
+
+def extract_zip_images(contents, max_files, max_bytes):
+    """
+    Synchronously extracts image entries from a zip archive held in memory.
+
+    Args:
+        contents: The raw bytes of the zip archive.
+        max_files: The maximum number of images accepted from the archive.
+        max_bytes: The maximum total uncompressed size of the accepted images.
+
+    Returns:
+        images: A list of (file name, bytes) tuples in archive order.
     """
-    image = image.resize(target_size)  # Resize the image to the target size
-    image_array = np.array(image)  # Convert the image to a numpy array
-    image_array = image_array.astype(np.float32) / 255.0  # Normalize the image
-    image_array = np.expand_dims(image_array, axis=0)  # Expand dimensions to add batch size
-    return image_array
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith('.')
+            and '__MACOSX' not in info.filename
+            and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        if len(entries) > max_files:
+            raise ValueError(f"Archive contains {len(entries)} images, the limit is {max_files}")
+        if sum(info.file_size for info in entries) > max_bytes:
+            raise ValueError(f"Archive images exceed {max_bytes} bytes uncompressed")
+        return [(os.path.basename(info.filename), archive.read(info)) for info in entries]
@@ -0,0 +1,164 @@
+import logging
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Optional runtimes (tflite_runtime / onnxruntime / tf2onnx) are imported only
+# when their backend is used, so the Keras-only deployment needs none of them.
+
+
+def load_pretrained_model(model_path):
+    """Load a pre-trained model from the specified path."""
+    import tensorflow as tf
+    try:
+        model = tf.keras.models.load_model(model_path)
+        logger.info("Model loaded successfully from %s", model_path)
+        return model
+    except Exception as e:
+        logger.error("Failed to load model from %s: %s", model_path, e)
+        raise
+
+
+class KerasBackend:
+    """Reference backend: the Keras SavedModel run with model.predict."""
+
+    name = "keras"
+
+    def __init__(self, model_path, num_threads=None):
+        if num_threads:
+            self._set_threads(num_threads)
+        self.model = load_pretrained_model(model_path)
+
+    @staticmethod
+    def _set_threads(num_threads):
+        # TensorFlow's thread pools are per process and fixed once the runtime starts, so only
+        # the first backend loaded in a process can size them; later ones keep what is set
+        import tensorflow as tf
+        threading = tf.config.threading
+        if (threading.get_intra_op_parallelism_threads() == num_threads
+                and threading.get_inter_op_parallelism_threads() == num_threads):
+            return
+        try:
+            threading.set_intra_op_parallelism_threads(num_threads)
+            threading.set_inter_op_parallelism_threads(num_threads)
+        except RuntimeError as e:
+            logger.warning("Cannot set TensorFlow to %s threads after it has started: %s", num_threads, e)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend:
+    """TensorFlow Lite flatbuffer (float32, float16 or int8 quantized)."""
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = self.input_detail["shape"][0]
+
+    def predict(self, batch):
+        if batch.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self.input_detail["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self._batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self.input_detail["index"], self._quantize(batch))
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self.output_detail["index"]))
+
+    def _quantize(self, batch):
+        dtype = self.input_detail["dtype"]
+        if dtype == np.float32:
+            return batch
+        scale, zero_point = self.input_detail["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output):
+        if self.output_detail["dtype"] == np.float32:
+            return output
+        scale, zero_point = self.output_detail["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+
+class ONNXBackend:
+    """ONNX Runtime on the CPU execution provider."""
+
+    name = "onnx"
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, TFLiteBackend, ONNXBackend)}
+
+
+def load_backend(kind, model_path, num_threads=None):
+    """Load ``model_path`` with the named inference backend."""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{kind}', expected one of {sorted(BACKENDS)}")
+    try:
+        backend = BACKENDS[kind](model_path, num_threads=num_threads)
+        logger.info("Model loaded successfully from %s with the %s backend", model_path, kind)
+        return backend
+    except Exception as e:
+        logger.error("Failed to load model from %s with the %s backend: %s", model_path, kind, e)
+        raise
+
+
+def export_tflite(saved_model_path, output_path, quantization="float16", representative_batches=None):
+    """Convert the Keras SavedModel to TFLite.
+
+    ``quantization`` is "none", "float16" (weights only) or "int8" (full
+    integer kernels, float input/output), which needs ``representative_batches``:
+    an iterable of preprocessed float32 batches used for calibration.
+    """
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if representative_batches is None:
+            raise ValueError("int8 quantization needs representative_batches for calibration")
+        batches = list(representative_batches)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([image[np.newaxis]] for batch in batches for image in batch)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != "none":
+        raise ValueError(f"Unknown TFLite quantization '{quantization}'")
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    logger.info("Exported %s TFLite model to %s", quantization, output_path)
+    return output_path
+
+
+def export_onnx(saved_model_path, output_path, input_shape=(224, 224, 3), opset=13):
+    """Convert the Keras SavedModel to ONNX with a dynamic batch dimension."""
+    import tensorflow as tf
+    import tf2onnx
+    model = tf.keras.models.load_model(saved_model_path)
+    signature = (tf.TensorSpec((None, *input_shape), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=output_path)
+    logger.info("Exported ONNX model to %s", output_path)
+    return output_path
@@ -0,0 +1,48 @@
+import os
+import logging
+import threading
+import numpy as np
+from .inference_backends import load_backend
+from .logging_service import configure_logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Every pool worker thread or process holds its own model instances, keyed by
+# model version, so concurrent batches never share a model. A version is
+# loaded the first time a worker is asked for it and dropped once it is no
+# longer among the versions the registry keeps loaded.
+_worker_state = threading.local()
+
+def init_worker(num_threads=None):
+    """Pool initializer: set up this worker's model cache."""
+    configure_logging()  # A no-op in thread workers; spawned processes start with logging unconfigured
+    _worker_state.models = {}
+    _worker_state.num_threads = num_threads
+
+def _get_backend(spec, keep_versions=None):
+    models = getattr(_worker_state, "models", None)
+    if models is None:
+        init_worker()
+        models = _worker_state.models
+    if keep_versions is not None:
+        for version in [version for version in models if version not in keep_versions]:
+            del models[version]
+            logger.info("Unloaded model %s from worker %s", version, worker_id())
+    backend = models.get(spec.version)
+    if backend is None:
+        backend = load_backend(spec.backend, spec.path, num_threads=_worker_state.num_threads)
+        models[spec.version] = backend
+    return backend
+
+def worker_id():
+    return f"{os.getpid()}-{threading.get_ident()}"
+
+def predict(spec, batch, keep_versions=None):
+    """Run model ``spec`` over ``batch`` on this worker and return the raw predictions."""
+    return _get_backend(spec, keep_versions).predict(batch)
+
+def warm_up(spec, input_shape, keep_versions=None):
+    """Load ``spec`` and run a dummy batch so the first real request does not pay load or tracing costs."""
+    predict(spec, np.zeros(input_shape, dtype=np.float32), keep_versions)
+    return worker_id()
@@ -1,21 +1,167 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
 import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
-import os
 
 load_dotenv()
 
+# Logging configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "sqlalchemy.engine=INFO,services.auth_service=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # 'json' or 'text'
+LOG_FILE = os.getenv("LOG_FILE", "app.log")  # Empty to log to stderr only
+LOG_TO_STDERR = os.getenv("LOG_TO_STDERR", "true").lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(request_id)s - %(message)s'
+
+# Attributes every LogRecord has; anything else on a record came from ``extra=`` and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+# Set per request by the API middleware and attached to every record logged while handling it
+request_id_var = contextvars.ContextVar("request_id", default=None)
 
-# Configure logging
-logging.basicConfig(level=LOG_LEVEL, filename='app.log', filemode='a',
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+_listener = None
+_queue_handler = None
+_dropped = 0
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the request ID of the context it was logged from."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with time, level, logger, request ID, message and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without ever blocking the caller.
+
+    The message is merged with its arguments here, so the listener never
+    sees objects the caller may still change, but file and stream I/O
+    happen on the listener thread. When the queue is full the record is
+    dropped and counted rather than stalling the event loop.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT, log_file=LOG_FILE):
+    """Route every logger through a queue to one background writer thread (idempotent).
+
+    Call once at process start; later calls only update logger levels.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    for name, logger_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if LOG_TO_STDERR or not handlers:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestIdFilter())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    _queue_handler = queue_handler
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        if _dropped:
+            print(f"Logging dropped {_dropped} records because its queue was full", file=sys.stderr)
+
+
+def get_logging_stats():
+    """Return the writer queue depth and how many records were dropped."""
+    return {
+        "queue_depth": _listener.queue.qsize() if _listener is not None else 0,
+        "max_queue": LOG_QUEUE_SIZE,
+        "dropped": _dropped,
+    }
+
 
-def log_info(message):
-    logger.info(message)
+def log_info(message, *args):
+    logger.info(message, *args)
 
-def log_warning(message):
-    logger.warning(message)
+def log_warning(message, *args):
+    logger.warning(message, *args)
 
-def log_error(message):
-    logger.error(message)
+def log_error(message, *args):
+    logger.error(message, *args)
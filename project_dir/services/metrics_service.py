@@ -0,0 +1,113 @@
+import os
+import logging
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Metric names are prefixed with this namespace, e.g. burn_stage_seconds
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'burn')
+
+# From a cache hit (~1ms) to a slow model call under load (~10s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Time per step of handling an image: upload_read, auth, decode, preprocess, inference
+# (including micro-batching), model_predict (the model call itself), persist and alert
+STAGE_SECONDS = Histogram(
+    "stage_seconds", "Time spent in each stage of handling an image",
+    ["stage"], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", namespace=METRICS_NAMESPACE,
+)
+MODEL_BATCH_SIZE = Histogram(
+    "model_batch_size", "Images per model call", namespace=METRICS_NAMESPACE, buckets=BATCH_SIZE_BUCKETS,
+)
+PREDICTIONS = Counter(
+    "predictions", "Predictions served, by predicted class",
+    ["predicted_class", "model_version", "cached"], namespace=METRICS_NAMESPACE,
+)
+LOW_CONFIDENCE_PREDICTIONS = Counter(
+    "low_confidence_predictions", "Predictions served with confidence below EXPECTED_ACCURACY",
+    ["predicted_class", "model_version"], namespace=METRICS_NAMESPACE,
+)
+PREDICTION_CONFIDENCE = Histogram(
+    "prediction_confidence", "Confidence of served predictions",
+    ["predicted_class"], namespace=METRICS_NAMESPACE, buckets=CONFIDENCE_BUCKETS,
+)
+WRITE_FLUSH_SECONDS = Histogram(
+    "write_flush_seconds", "Time per write-behind flush to the database",
+    ["buffer"], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS,
+)
+WRITE_FLUSH_ROWS = Histogram(
+    "write_flush_rows", "Rows written per write-behind flush",
+    ["buffer"], namespace=METRICS_NAMESPACE, buckets=BATCH_SIZE_BUCKETS,
+)
+
+
+def stage_timer(stage):
+    """Return a context manager (or decorator) that observes its duration as ``stage``."""
+    return STAGE_SECONDS.labels(stage).time()
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+def record_prediction(predicted_class, confidence, model_version, low_confidence, cached=False):
+    """Count one served prediction by class, and separately when its confidence is low."""
+    model_version = model_version or ""
+    PREDICTIONS.labels(predicted_class, model_version, "true" if cached else "false").inc()
+    PREDICTION_CONFIDENCE.labels(predicted_class).observe(confidence)
+    if low_confidence:
+        LOW_CONFIDENCE_PREDICTIONS.labels(predicted_class, model_version).inc()
+
+
+class QueueCollector:
+    """Reports the depth and capacity of every registered queue as gauges.
+
+    Nothing is tracked between scrapes: each scrape reads the queues'
+    existing ``stats()`` dicts, so the request path pays nothing for these.
+    """
+
+    def __init__(self):
+        self._queues = {}
+
+    def register(self, name, stats_fn, depth_key="queue_depth", capacity_key="max_queue"):
+        """Report ``stats_fn()[depth_key]`` as queue ``name``; ``stats_fn`` may return None while it is not running."""
+        self._queues[name] = (stats_fn, depth_key, capacity_key)
+
+    def collect(self):
+        depth = GaugeMetricFamily(f"{METRICS_NAMESPACE}_queue_depth", "Items waiting in each queue", labels=["queue"])
+        capacity = GaugeMetricFamily(f"{METRICS_NAMESPACE}_queue_capacity", "Maximum items each queue accepts", labels=["queue"])
+        for name, (stats_fn, depth_key, capacity_key) in self._queues.items():
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                logger.warning("Failed to read queue metrics for %s: %s", name, e)
+                continue
+            if not stats:
+                continue
+            depth.add_metric([name], stats[depth_key])
+            if capacity_key is not None and stats.get(capacity_key) is not None:
+                capacity.add_metric([name], stats[capacity_key])
+        yield depth
+        yield capacity
+
+
+queue_collector = QueueCollector()
+REGISTRY.register(queue_collector)
+
+
+def render_metrics():
+    """Return the Prometheus text exposition of every metric and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
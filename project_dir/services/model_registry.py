@@ -0,0 +1,137 @@
+import random
+import logging
+from collections import namedtuple
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A servable model: a version label plus the artifact and backend used to load it.
+# Specs are passed to the inference workers with every batch, so they must stay picklable.
+ModelSpec = namedtuple("ModelSpec", ["version", "path", "backend"])
+
+
+class ModelRegistry:
+    """Known model versions, the one serving traffic and an optional shadow candidate.
+
+    Swapping ``serving`` is a single attribute assignment on the event loop:
+    batches already dispatched keep the spec they were started with, and
+    every batch dispatched afterwards uses the new one. Inference workers
+    keep only the versions in ``loaded_versions()`` in memory.
+    """
+
+    def __init__(self, serving):
+        self._models = {serving.version: serving}
+        self.serving = serving
+        self.shadow = None
+        self.shadow_fraction = 0.0
+        self._reset_shadow_stats()
+
+    def register(self, spec):
+        """Add a model version; registering an existing version with a different artifact is refused."""
+        existing = self._models.get(spec.version)
+        if existing is not None and existing != spec:
+            raise ValueError(f"Model version {spec.version} is already registered with a different artifact")
+        self._models[spec.version] = spec
+        logger.info("Registered model %s (%s, %s)", spec.version, spec.backend, spec.path)
+        return spec
+
+    def unregister(self, version):
+        """Forget a model version that is neither serving nor shadowing."""
+        spec = self.get(version)
+        if spec == self.serving or spec == self.shadow:
+            raise ValueError(f"Model version {version} is in use and cannot be removed")
+        del self._models[version]
+        logger.info("Unregistered model %s", version)
+
+    def get(self, version):
+        spec = self._models.get(version)
+        if spec is None:
+            raise KeyError(f"Unknown model version {version}")
+        return spec
+
+    def activate(self, version):
+        """Make ``version`` the serving model; returns the spec it replaced."""
+        spec = self.get(version)
+        previous, self.serving = self.serving, spec
+        if self.shadow == spec:
+            self.clear_shadow()
+        logger.info("Serving model switched from %s to %s", previous.version, spec.version)
+        return previous
+
+    def set_shadow(self, version, fraction):
+        """Score ``fraction`` of served batches on ``version`` as well, for comparison only."""
+        spec = self.get(version)
+        if spec == self.serving:
+            raise ValueError(f"Model version {version} is already serving")
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError("Shadow fraction must be in (0, 1]")
+        if spec != self.shadow:
+            self._reset_shadow_stats()
+        self.shadow = spec
+        self.shadow_fraction = fraction
+        logger.info("Shadow scoring %.0f%% of traffic on model %s", fraction * 100, version)
+
+    def clear_shadow(self):
+        if self.shadow is not None:
+            logger.info("Stopped shadow scoring on model %s", self.shadow.version)
+        self.shadow = None
+        self.shadow_fraction = 0.0
+
+    def loaded_versions(self):
+        """Versions the inference workers should keep in memory."""
+        versions = {self.serving.version}
+        if self.shadow is not None:
+            versions.add(self.shadow.version)
+        return frozenset(versions)
+
+    def should_shadow(self):
+        return self.shadow is not None and random.random() < self.shadow_fraction
+
+    def _reset_shadow_stats(self):
+        self._shadow_batches = 0
+        self._shadow_items = 0
+        self._shadow_agreements = 0
+        self._shadow_drift_total = 0.0
+        self._shadow_skipped = 0
+        self._shadow_errors = 0
+
+    def record_shadow(self, serving_predictions, shadow_predictions):
+        """Compare the shadow model's outputs with what was served for the same batch."""
+        serving_predictions = np.asarray(serving_predictions)
+        shadow_predictions = np.asarray(shadow_predictions)
+        self._shadow_batches += 1
+        self._shadow_items += serving_predictions.shape[0]
+        self._shadow_agreements += int((serving_predictions.argmax(axis=-1) == shadow_predictions.argmax(axis=-1)).sum())
+        self._shadow_drift_total += float(np.abs(serving_predictions.max(axis=-1) - shadow_predictions.max(axis=-1)).sum())
+
+    def record_shadow_skipped(self):
+        self._shadow_skipped += 1
+
+    def record_shadow_error(self):
+        self._shadow_errors += 1
+
+    def list(self):
+        return [
+            {
+                **spec._asdict(),
+                "serving": spec == self.serving,
+                "shadow": spec == self.shadow,
+            }
+            for spec in self._models.values()
+        ]
+
+    def stats(self):
+        """Return the serving/shadow versions and how closely the shadow agrees with serving."""
+        items = self._shadow_items
+        return {
+            "serving": self.serving.version,
+            "shadow": self.shadow.version if self.shadow is not None else None,
+            "shadow_fraction": self.shadow_fraction,
+            "shadow_batches": self._shadow_batches,
+            "shadow_items": items,
+            "shadow_agreement": self._shadow_agreements / items if items else None,
+            "shadow_confidence_drift_mean": self._shadow_drift_total / items if items else None,
+            "shadow_skipped": self._shadow_skipped,
+            "shadow_errors": self._shadow_errors,
+        }
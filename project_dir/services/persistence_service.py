@@ -0,0 +1,120 @@
+import time
+import asyncio
+import logging
+from .metrics_service import WRITE_FLUSH_SECONDS, WRITE_FLUSH_ROWS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Collects rows in memory and writes them in bulk from a background task.
+
+    A flush happens when ``flush_rows`` rows are waiting or every
+    ``flush_interval_ms``, whichever comes first. Rows from a failed flush
+    are kept and retried on the next one, up to ``max_buffered_rows``; past
+    that the oldest rows are dropped so memory stays bounded.
+    """
+
+    def __init__(self, name, flush_fn, flush_rows=200, flush_interval_ms=500, max_buffered_rows=10000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+        self.max_buffered_rows = max(self.flush_rows, int(max_buffered_rows))
+        self._rows = []
+        self._wakeup = None
+        self._worker = None
+        self._flush_lock = None
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failures = 0
+        self._dropped_rows = 0
+        self._last_flush_ms = 0.0
+
+    def start(self):
+        """Start the background flush loop on the running event loop (idempotent)."""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            logger.info("%s write buffer started (flush_rows=%s, flush_interval_ms=%.0f)",
+                        self.name, self.flush_rows, self.flush_interval * 1000)
+
+    async def stop(self):
+        """Stop the flush loop and write out everything still buffered."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush()
+        if self._rows:
+            logger.error("%s write buffer stopped with %s unsaved rows", self.name, len(self._rows))
+        logger.info("%s write buffer stopped", self.name)
+
+    def add(self, row):
+        """Buffer one row for the next bulk write."""
+        self.add_many([row])
+
+    def add_many(self, rows):
+        """Buffer several rows for the next bulk write."""
+        self._rows.extend(rows)
+        overflow = len(self._rows) - self.max_buffered_rows
+        if overflow > 0:
+            del self._rows[:overflow]
+            self._dropped_rows += overflow
+            logger.error("%s write buffer full, dropped %s oldest rows", self.name, overflow)
+        if len(self._rows) >= self.flush_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every buffered row now, in chunks of at most ``flush_rows``."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            # Only the rows buffered when the flush began; rows added while it writes wait
+            # for the next one, so a steady trickle still produces full batches
+            remaining = len(self._rows)
+            while remaining > 0 and self._rows:
+                chunk = self._rows[:min(self.flush_rows, remaining)]
+                del self._rows[:len(chunk)]
+                remaining -= len(chunk)
+                start = time.perf_counter()
+                try:
+                    await self.flush_fn(chunk)
+                except Exception as e:
+                    self._failures += 1
+                    logger.error("%s write buffer failed to flush %s rows: %s", self.name, len(chunk), e)
+                    # Put the rows back in front and retry on the next flush
+                    self._rows[:0] = chunk
+                    return
+                elapsed = time.perf_counter() - start
+                self._flushes += 1
+                self._flushed_rows += len(chunk)
+                self._last_flush_ms = elapsed * 1000
+                WRITE_FLUSH_SECONDS.labels(self.name).observe(elapsed)
+                WRITE_FLUSH_ROWS.labels(self.name).observe(len(chunk))
+
+    def stats(self):
+        """Return buffer depth and flush metrics."""
+        return {
+            "buffered_rows": len(self._rows),
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "avg_rows_per_flush": self._flushed_rows / self._flushes if self._flushes else 0.0,
+            "last_flush_ms": self._last_flush_ms,
+            "failures": self._failures,
+            "dropped_rows": self._dropped_rows,
+        }
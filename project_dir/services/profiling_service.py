@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Sampling profiler configuration
+PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '10'))
+PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '300'))
+PROFILER_MAX_DEPTH = int(os.getenv('PROFILER_MAX_DEPTH', '64'))
+
+
+class SamplingProfiler:
+    """Samples the Python stack of every thread from a background thread while running.
+
+    Costs nothing until started, and stops by itself after at most
+    ``max_seconds``. Stacks are counted in collapsed form, one
+    ``thread;outer;...;inner count`` line per distinct stack, which
+    flamegraph.pl and speedscope read directly. Only this process is
+    sampled; inference workers running as separate processes are not.
+    """
+
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, max_seconds=PROFILER_MAX_SECONDS, max_depth=PROFILER_MAX_DEPTH):
+        self.interval = max(1.0, float(interval_ms)) / 1000.0
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._started_at = None
+        self._stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None):
+        """Discard the previous profile and start sampling for ``seconds`` (capped at max_seconds).
+
+        Returns False if the profiler is already running.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            seconds = min(seconds or self.max_seconds, self.max_seconds)
+            self._stacks = Counter()
+            self._samples = 0
+            self._stop.clear()
+            self._started_at = time.time()
+            self._stopped_at = None
+            self._thread = threading.Thread(
+                target=self._run, args=(time.monotonic() + seconds,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info("Sampling profiler started for %.0fs every %.0fms", seconds, self.interval * 1000)
+        return True
+
+    def stop(self):
+        """Stop sampling; the collected profile stays available until the next start."""
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self, deadline):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                samples.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(samples)
+                self._samples += 1
+        self._stopped_at = time.time()
+        logger.info("Sampling profiler stopped after %s samples", self._samples)
+
+    def collapsed(self):
+        """Return the profile so far as collapsed stacks, most sampled first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self._samples,
+            "stacks": len(self._stacks),
+            "started_at": self._started_at,
+            "stopped_at": self._stopped_at,
+        }
+
+
+profiler = SamplingProfiler()
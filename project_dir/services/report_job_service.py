@@ -0,0 +1,258 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dotenv import load_dotenv
+from .executor_service import BoundedExecutor, ExecutorOverloadedError
+from .report_service import render_report
+from .alert_service import alert_dispatcher, ALERT_CLASSES
+from .database import get_classification
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Report job configuration
+REPORT_RENDER_EXECUTOR = os.getenv('REPORT_RENDER_EXECUTOR', 'thread')  # 'thread' or 'process'
+REPORT_RENDER_WORKERS = int(os.getenv('REPORT_RENDER_WORKERS', '2'))
+REPORT_QUEUE_SIZE = int(os.getenv('REPORT_QUEUE_SIZE', '64'))
+REPORT_STORE_MAX_JOBS = int(os.getenv('REPORT_STORE_MAX_JOBS', '500'))
+REPORT_STORE_MAX_BYTES = int(os.getenv('REPORT_STORE_MAX_BYTES', str(256 * 1024 * 1024)))
+REPORT_RESULT_TTL_SECONDS = float(os.getenv('REPORT_RESULT_TTL_SECONDS', '3600'))
+REPORT_EMAIL_ENABLED = os.getenv('REPORT_EMAIL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+class ReportNotFoundError(LookupError):
+    """Raised when a report is requested for a classification the user does not have."""
+
+
+class ReportJob:
+    """One queued report: its inputs, progress and, once rendered, the workbook."""
+
+    def __init__(self, user_id, predicted_class, confidence, image_data, image_name):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.predicted_class = predicted_class
+        self.confidence = confidence
+        self.image_name = image_name
+        self.image_data = image_data
+        self.status = "queued"
+        self.error = None
+        self.result = None
+        self.email_status = "pending" if REPORT_EMAIL_ENABLED else "disabled"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("ready", "failed")
+
+    @property
+    def file_name(self):
+        # Only characters that are safe unquoted in a Content-Disposition header
+        stem = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.splitext(os.path.basename(self.image_name))[0])
+        return f"report-{stem or self.id}.xlsx"
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "predicted_class": self.predicted_class,
+            "confidence": self.confidence,
+            "image_name": self.image_name,
+            "error": self.error,
+            "size_bytes": len(self.result) if self.result is not None else None,
+            "email_status": self.email_status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ReportJobQueue:
+    """Renders reports in a worker pool and hands their alert emails to the alert dispatcher.
+
+    ``submit`` returns a job right away; rendering happens on one of
+    ``render_workers`` pool workers and the alert email is queued with
+    ``notify`` afterwards, which never waits for SMTP. At most
+    ``max_queued`` jobs wait to be rendered; beyond that ``submit`` raises
+    ``ExecutorOverloadedError``. Only reports for ``alert_classes`` send an
+    email. Finished jobs are kept until they expire or the store exceeds
+    ``max_jobs`` / ``max_bytes``, oldest first.
+    """
+
+    def __init__(self, render_executor=REPORT_RENDER_EXECUTOR, render_workers=REPORT_RENDER_WORKERS,
+                 max_queued=REPORT_QUEUE_SIZE, max_jobs=REPORT_STORE_MAX_JOBS, max_bytes=REPORT_STORE_MAX_BYTES,
+                 ttl_seconds=REPORT_RESULT_TTL_SECONDS, alert_classes=ALERT_CLASSES, notify=None):
+        self.render_executor = render_executor
+        self.render_workers = max(1, int(render_workers))
+        self.max_queued = max(1, int(max_queued))
+        self.max_jobs = max(1, int(max_jobs))
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.alert_classes = set(alert_classes)
+        self.notify = notify or alert_dispatcher.submit
+        self._jobs = OrderedDict()
+        self._stored_bytes = 0
+        self._pool = None
+        self._render_queue = None
+        self._workers = []
+        self._submitted = 0
+        self._rejected = 0
+        self._rendered = 0
+        self._failed = 0
+        self._evicted = 0
+        self._render_seconds_total = 0.0
+        self._emails_submitted = 0
+        self._emails_failed = 0
+
+    def start(self):
+        """Start the render workers on the running event loop (idempotent)."""
+        if self._workers:
+            return
+        if self._pool is None:
+            self._pool = BoundedExecutor("report-render", kind=self.render_executor, max_workers=self.render_workers)
+        self._render_queue = asyncio.Queue(maxsize=self.max_queued)
+        loop = asyncio.get_running_loop()
+        self._workers = [loop.create_task(self._render_loop()) for _ in range(self.render_workers)]
+        logger.info("Report jobs started (%s, workers=%s, queue=%s)",
+                    self.render_executor, self.render_workers, self.max_queued)
+
+    async def stop(self):
+        """Stop the render workers; jobs still queued are marked failed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while self._render_queue is not None and not self._render_queue.empty():
+            self._fail(self._render_queue.get_nowait(), "Report service stopped")
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        logger.info("Report jobs stopped")
+
+    def submit(self, user_id, predicted_class, confidence, image_data, image_name="image.png"):
+        """Queue a report and return its job; poll ``get(job.id)`` for the result."""
+        self.start()
+        job = ReportJob(user_id, predicted_class, confidence, image_data, image_name)
+        if job.email_status == "pending" and predicted_class not in self.alert_classes:
+            job.email_status = "not_required"
+        try:
+            self._render_queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise ExecutorOverloadedError(f"Report queue is full ({self.max_queued} queued jobs)")
+        self._submitted += 1
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.done and time.time() - job.finished_at > self.ttl_seconds:
+            self._evict(job)
+            return None
+        return job
+
+    async def _render_loop(self):
+        while True:
+            job = await self._render_queue.get()
+            job.status = "rendering"
+            job.started_at = time.time()
+            try:
+                report_data = await self._pool.run(
+                    render_report, job.predicted_class, job.confidence, job.image_data, job.image_name
+                )
+            except asyncio.CancelledError:
+                self._fail(job, "Report service stopped")
+                raise
+            except Exception as e:
+                logger.error("Failed to render report %s: %s", job.id, e)
+                self._fail(job, "Report rendering failed")
+                continue
+            job.result = report_data
+            job.status = "ready"
+            job.finished_at = time.time()
+            self._rendered += 1
+            self._render_seconds_total += job.finished_at - job.started_at
+            self._stored_bytes += len(report_data)
+            self._prune()
+            if job.email_status == "pending":
+                self._notify(job)
+            job.image_data = None
+
+    def _notify(self, job):
+        try:
+            job.email_status = self.notify(job.predicted_class, job.confidence, job.image_data, job.image_name)
+            self._emails_submitted += 1
+        except Exception as e:
+            job.email_status = "failed"
+            self._emails_failed += 1
+            logger.error("Failed to queue email for report %s: %s", job.id, e)
+
+    def _fail(self, job, error):
+        job.status = "failed"
+        job.error = error
+        job.image_data = None
+        job.finished_at = time.time()
+        if job.email_status == "pending":
+            job.email_status = "skipped"
+        self._failed += 1
+
+    def _evict(self, job):
+        self._jobs.pop(job.id, None)
+        if job.result is not None:
+            self._stored_bytes -= len(job.result)
+            job.result = None
+        self._evicted += 1
+
+    def _prune(self):
+        """Drop expired results, then the oldest finished jobs while the store is over its limits."""
+        now = time.time()
+        for job in [job for job in self._jobs.values() if job.done and now - job.finished_at > self.ttl_seconds]:
+            self._evict(job)
+        for job in [job for job in self._jobs.values() if job.done]:
+            if len(self._jobs) <= self.max_jobs and self._stored_bytes <= self.max_bytes:
+                break
+            self._evict(job)
+
+    def stats(self):
+        """Return queue depth, throughput and email delivery metrics."""
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "queued": self._render_queue.qsize() if self._render_queue is not None else 0,
+            "max_queued": self.max_queued,
+            "jobs": statuses,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "rendered": self._rendered,
+            "failed": self._failed,
+            "avg_render_seconds": self._render_seconds_total / self._rendered if self._rendered else 0.0,
+            "stored_jobs": len(self._jobs),
+            "stored_bytes": self._stored_bytes,
+            "evicted": self._evicted,
+            "emails_submitted": self._emails_submitted,
+            "emails_failed": self._emails_failed,
+            "render_pool": self._pool.stats() if self._pool is not None else None,
+        }
+
+
+report_jobs = ReportJobQueue()
+
+
+async def submit_classification_report(user_id, classification_id, image_data):
+    """Queue a report for one of the user's stored classifications, using its class and confidence."""
+    classification = await get_classification(classification_id)
+    if classification is None or classification["user_id"] != user_id:
+        raise ReportNotFoundError(f"Classification {classification_id} not found")
+    return report_jobs.submit(
+        user_id, classification["predicted_class"], classification["confidence"], image_data,
+        classification["image_name"] or "image.png"
+    )
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .database import get_classification_stats, get_classification_daily_stats, ALL_USERS, CONFIDENCE_BUCKETS
+
+# Load environment variables
+load_dotenv()
+
+# Daily trend range: the last STATISTICS_DEFAULT_DAYS unless start/end are given, never more than STATISTICS_MAX_DAYS
+STATISTICS_DEFAULT_DAYS = int(os.getenv('STATISTICS_DEFAULT_DAYS', '30'))
+STATISTICS_MAX_DAYS = int(os.getenv('STATISTICS_MAX_DAYS', '366'))
+
+def _trend_range(start, end):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=STATISTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days + 1 > STATISTICS_MAX_DAYS:
+        raise ValueError(f"At most {STATISTICS_MAX_DAYS} days of trend per request")
+    return start, end
+
+def _histogram(counts):
+    return [
+        {"min": bucket / CONFIDENCE_BUCKETS, "max": (bucket + 1) / CONFIDENCE_BUCKETS, "count": count}
+        for bucket, count in enumerate(counts)
+    ]
+
+async def get_classification_summary(user_id=ALL_USERS, start=None, end=None):
+    """Counts by class, confidence histograms and a daily trend, read from the rollup tables.
+
+    Reads at most CONFIDENCE_BUCKETS rows per class plus one row per class
+    and day of the trend, however much classification history there is.
+    """
+    start, end = _trend_range(start, end)
+    stats = await get_classification_stats(user_id)
+    daily = await get_classification_daily_stats(user_id, start, end)
+
+    total = sum(row["count"] for row in stats)
+    confidence_sum = sum(row["confidence_sum"] for row in stats)
+    histogram = [0] * CONFIDENCE_BUCKETS
+    classes = {}
+    for row in stats:
+        entry = classes.setdefault(
+            row["predicted_class"], {"count": 0, "confidence_sum": 0.0, "histogram": [0] * CONFIDENCE_BUCKETS}
+        )
+        entry["count"] += row["count"]
+        entry["confidence_sum"] += row["confidence_sum"]
+        entry["histogram"][row["confidence_bucket"]] += row["count"]
+        histogram[row["confidence_bucket"]] += row["count"]
+
+    # One entry per day in the range, including days without classifications, so charts need no gap filling
+    days = {start + timedelta(days=offset): {} for offset in range((end - start).days + 1)}
+    for row in daily:
+        days[row["day"]][row["predicted_class"]] = row["count"]
+
+    return {
+        "user_id": None if user_id == ALL_USERS else user_id,
+        "total": total,
+        "mean_confidence": confidence_sum / total if total else None,
+        "by_class": [
+            {
+                "predicted_class": predicted_class,
+                "count": entry["count"],
+                "share": entry["count"] / total,
+                "mean_confidence": entry["confidence_sum"] / entry["count"] if entry["count"] else None,
+                "confidence_histogram": _histogram(entry["histogram"]),
+            }
+            for predicted_class, entry in sorted(classes.items())
+        ],
+        "confidence_histogram": _histogram(histogram),
+        "daily": [
+            {"day": day.isoformat(), "count": sum(counts.values()), "by_class": counts}
+            for day, counts in days.items()
+        ],
+    }
@@ -1,19 +1,95 @@
+import os
+import json
+import hashlib
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# API client configuration
+API_URL = os.getenv("API_URL", "http://api:8000").rstrip("/")
+API_TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "60"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+PREDICT_BATCH_MAX_FILES = int(os.getenv("PREDICT_BATCH_MAX_FILES", "64"))
+
+
+class ApiClient:
+    """Talks to the API over a pooled requests.Session, so reruns reuse open keep-alive connections."""
+
+    def __init__(self, base_url, timeout=API_TIMEOUT_SECONDS, pool_size=API_POOL_SIZE):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Only failed connection attempts are retried; a POST that reached the API is never sent twice
+        retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, path, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return self.session.post(f"{self.base_url}{path}", headers=headers, timeout=self.timeout, **kwargs)
+
+    def login(self, username, password):
+        return self.post("/login", json={"username": username, "password": password})
+
+    def register(self, username, password):
+        return self.post("/register", json={"username": username, "password": password})
+
+    def predict_batch(self, token, files):
+        """Classify ``(name, bytes, content type)`` files in one /predict/batch call.
+
+        Returns the status code, one ``(index, classification, error, retryable)``
+        tuple per file read from the NDJSON stream, and the error detail when
+        the API refused the whole request.
+        """
+        response = self.post(
+            "/predict/batch",
+            token=token,
+            files=[("files", file) for file in files],
+            stream=True,
+        )
+        with response:
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get("detail")
+                except ValueError:
+                    detail = None
+                return response.status_code, [], detail or response.reason
+            results = []
+            for line in response.iter_lines():
+                if line:
+                    result = json.loads(line)
+                    results.append((
+                        result["index"], result.get("classification"), result.get("error"), result.get("retryable", False)
+                    ))
+        return 200, results, None
+
+
+# One client, and so one connection pool, shared by every session and rerun of this script
+@st.cache_resource
+def get_api_client():
+    return ApiClient(API_URL)
+
+api = get_api_client()
 
 # Initialize session state variables
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'token' not in st.session_state:
     st.session_state.token = None
+if 'predictions' not in st.session_state:
+    # Results by sha256 of the uploaded bytes, so a rerun never re-sends an image already classified
+    st.session_state.predictions = {}
 
 # Define the login function
 def login(username, password):
     try:
-        response = requests.post("http://api:8000/login", json={"username": username, "password": password})
+        response = api.login(username, password)
         if response.status_code == 200:
             st.session_state.logged_in = True
             st.session_state.token = response.json().get("access_token")
+            st.session_state.predictions = {}
             return True
         else:
             st.error("Login failed. Please check your username and password.")
@@ -25,7 +101,7 @@ def login(username, password):
 # Define the register function
 def register(username, password):
     try:
-        response = requests.post("http://api:8000/register", json={"username": username, "password": password})
+        response = api.register(username, password)
         if response.status_code == 200:
             st.success("Registration successful! You can now log in.")
             return True
@@ -40,6 +116,49 @@ def register(username, password):
 def logout():
     st.session_state.logged_in = False
     st.session_state.token = None
+    st.session_state.predictions = {}
+
+def classify(uploaded_files):
+    """Classify every upload not seen before in this session, in as few batch calls as possible."""
+    predictions = st.session_state.predictions
+    digests = [hashlib.sha256(uploaded_file.getvalue()).hexdigest() for uploaded_file in uploaded_files]
+    pending = {}
+    for uploaded_file, digest in zip(uploaded_files, digests):
+        if digest not in predictions and digest not in pending:
+            pending[digest] = uploaded_file
+    pending = list(pending.items())
+    chunks = [pending[start:start + PREDICT_BATCH_MAX_FILES] for start in range(0, len(pending), PREDICT_BATCH_MAX_FILES)]
+    while chunks:
+        chunk = chunks.pop(0)
+        status_code, results, detail = api.predict_batch(
+            st.session_state.token,
+            [(uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type) for _, uploaded_file in chunk],
+        )
+        if status_code == 401:
+            logout()
+            st.error("Your session has expired. Please log in again.")
+            return None
+        if status_code == 503:
+            st.warning("The classifier is busy. Please try again in a moment.")
+            break
+        if status_code in (400, 413, 415):
+            # The API validates every upload before classifying any, so one bad file
+            # rejects the whole batch; resend the files one by one to find it
+            if len(chunk) > 1:
+                chunks[:0] = [[item] for item in chunk]
+            else:
+                predictions[chunk[0][0]] = {"error": detail}
+            continue
+        if status_code != 200:
+            st.error("Error during prediction. Please try again.")
+            break
+        for index, classification, error, retryable in results:
+            digest = chunk[index][0]
+            if error is None:
+                predictions[digest] = classification
+            elif not retryable:
+                predictions[digest] = {"error": error}  # Retryable errors are not cached, so the next rerun retries
+    return [predictions.get(digest) for digest in digests]
 
 # Main app structure with tabs for Login and Register
 if not st.session_state.logged_in:
@@ -67,26 +186,29 @@ else:
     # Main application content
     st.title("Burn Classification Dashboard")
 
-    uploaded_file = st.file_uploader("Upload an image for classification", type=["png", "jpg", "jpeg"])
-
-    if uploaded_file is not None:
-        st.image(uploaded_file, caption="Uploaded Image", use_column_width=True)
-        st.write("Classifying...")
+    uploaded_files = st.file_uploader(
+        "Upload images for classification", type=["png", "jpg", "jpeg"], accept_multiple_files=True
+    )
 
+    if uploaded_files:
         try:
-            headers = {"Authorization": f"Bearer {st.session_state.token}"}
-            response = requests.post("http://api:8000/predict", files={"file": uploaded_file.getvalue()}, headers=headers)
-
-            if response.status_code == 200:
-                result = response.json()
-                st.write(f"Predicted Class: {result['classification']['predicted_class']}")
-                st.write(f"Confidence: {result['classification']['confidence']:.2f}")
-
-                # Example: st.download_button("Download Report", data=report_data, file_name="report.xlsx")
-            else:
-                st.error("Error during prediction. Please try again.")
+            with st.spinner("Classifying..."):
+                results = classify(uploaded_files)
         except requests.exceptions.ConnectionError:
             st.error("Unable to connect to the backend. Please check your connection.")
+            results = None
+
+        for uploaded_file, result in zip(uploaded_files, results or []):
+            st.image(uploaded_file, caption=uploaded_file.name, use_column_width=True)
+            if result is None:
+                st.warning("Not classified yet. Please try again.")
+            elif "error" in result:
+                st.error(f"Could not classify {uploaded_file.name}: {result['error']}")
+            else:
+                st.write(f"Predicted Class: {result['predicted_class']}")
+                st.write(f"Confidence: {result['confidence']:.2f}")
+
+                # Example: st.download_button("Download Report", data=report_data, file_name="report.xlsx")
 
     if st.button("Logout"):
         logout()
@@ -0,0 +1,62 @@
+"""Rebuild the classification statistics rollups from the classifications table.
+
+The rollup tables (classification_stats and classification_daily_stats) are
+kept current by every insert once the API runs this version, so this only
+needs to run once after upgrading, or to repair the rollups. It empties both
+tables, notes the highest classification id at that moment and adds every
+classification up to that id in chunks of --chunk-size, each in its own
+transaction. Emptying the tables and taking the high-water id happen while
+inserts into classifications are briefly blocked, so every classification
+is counted exactly once: those up to the high-water id by this tool, later
+ones by the API's write path. The API can therefore stay up. Running it
+again starts over from empty and gives the same result.
+
+Usage:
+    python tools/backfill_stats.py --chunk-size 10000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import database  # noqa: E402
+from services.logging_service import configure_logging  # noqa: E402
+
+logger = logging.getLogger("backfill_stats")
+
+
+async def run(args):
+    started = time.monotonic()
+    try:
+        high_water = await database.clear_classification_stats()
+        after_id, total = 0, 0
+        while after_id < high_water:
+            count, after_id = await database.backfill_classification_stats(after_id, high_water, args.chunk_size)
+            total += count
+            if not count:
+                break
+            logger.info("Backfilled %d classifications, up to id %d of %d", total, after_id, high_water)
+    finally:
+        await database.engine.dispose()
+    elapsed = time.monotonic() - started
+    logger.info("Backfill finished: %d classifications in %.1fs", total, elapsed)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Classifications per transaction")
+    args = parser.parse_args()
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    configure_logging(log_format="text", log_file="")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Bring an existing database up to the schema the API and tools expect.
+
+init.sql only runs when the Postgres data volume is first created, so a
+database created by an older version is missing whatever was added since
+(for example classifications.model_version, feedback_aggregates, the
+classification statistics rollups and bulk_load_chunks). Run this once
+after every upgrade, before starting the new API version. It creates
+missing tables, adds missing columns and creates missing indexes, never
+drops or rewrites anything, and does nothing when the schema is current.
+
+Creating an index on a large existing table blocks writes to it until the
+index is built. After adding the statistics rollups, fill them with
+tools/backfill_stats.py.
+
+Usage:
+    python tools/migrate.py
+"""
+import os
+import sys
+import asyncio
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import database  # noqa: E402
+from services.logging_service import configure_logging  # noqa: E402
+
+logger = logging.getLogger("migrate")
+
+
+async def run():
+    try:
+        return await database.migrate_db()
+    finally:
+        await database.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    configure_logging(log_format="text", log_file="")
+    changes = asyncio.run(run())
+    if not changes:
+        logger.info("Nothing to migrate")
+
+
+if __name__ == "__main__":
+    main()
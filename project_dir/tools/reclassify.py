@@ -0,0 +1,341 @@
+"""Re-score an archive of images with a model and store the results in bulk.
+
+Images come from a directory (walked recursively) or a manifest: a text
+file with one path per line, or a CSV with a ``path`` column and optional
+``user_id`` and ``image_name`` columns. They are cut into chunks of
+--batch-size and run through three pipeline stages with bounded queues:
+
+- decode: a pool of spawned processes reads and decodes whole chunks
+- inference: one model call per chunk, in this process
+- write: COPY into the classifications table (db), appending to a CSV file
+  (csv) or one Parquet file per chunk in a directory (parquet, needs pyarrow)
+
+Every written chunk is recorded in a checkpoint file, so an interrupted run
+picks up where it stopped when started again with the same arguments. CSV
+output is truncated back to the last checkpointed chunk. Database output
+also records each chunk in bulk_load_chunks in the same transaction as its
+COPY, so a chunk committed just before a crash is skipped on resume even if
+the checkpoint file missed it. --restart refuses to reload chunks already in
+the database unless --force-duplicate is given. Progress and the final
+summary report images/sec.
+
+Usage:
+    python tools/reclassify.py --images /data/archive --output csv --output-path /data/rescored.csv \\
+        --user-id 1 --model-path /project_dir/models/burn_classifier_v2 --model-version v2
+    python tools/reclassify.py --manifest history.csv --output db --model-path ... --model-version v2
+"""
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import logging
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_service import decode_files, IMAGE_EXTENSIONS  # noqa: E402
+from services.inference_backends import load_backend, BACKENDS  # noqa: E402
+from services.executor_service import BoundedExecutor  # noqa: E402
+from services.classification_service import (  # noqa: E402
+    FEATURE_NAMES, IMG_SIZE, MODEL_PATH, MODEL_VERSION, INFERENCE_BACKEND, INFERENCE_BACKEND_THREADS
+)
+from services import database  # noqa: E402
+from services.logging_service import configure_logging  # noqa: E402
+from pipelines.classification_pipeline import StagedPipeline, PipelineStage, PipelineItem  # noqa: E402
+
+logger = logging.getLogger("reclassify")
+
+OUTPUT_COLUMNS = ["user_id", "image_name", "predicted_class", "confidence", "timestamp", "model_version"]
+
+
+def list_directory(image_dir, user_id):
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(image_dir)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [(path, os.path.relpath(path, image_dir), user_id) for path in paths]
+
+
+def read_manifest(manifest_path, user_id):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline="") as f:
+        first_line = f.readline()
+        f.seek(0)
+        if "path" in [column.strip() for column in first_line.split(",")]:
+            rows = [(row["path"], row.get("image_name"), row.get("user_id")) for row in csv.DictReader(f)]
+        else:
+            rows = [(line.strip(), None, None) for line in f if line.strip()]
+    entries = []
+    for path, image_name, row_user_id in rows:
+        full_path = path if os.path.isabs(path) else os.path.join(base_dir, path)
+        entries.append((full_path, image_name or path, int(row_user_id) if row_user_id else user_id))
+    return entries
+
+
+class Checkpoint:
+    """Which chunks of a run have been written, persisted atomically after every chunk."""
+
+    def __init__(self, path, fingerprint, restart=False):
+        self.path = path
+        self.state = {"fingerprint": fingerprint, "done": [], "images": 0, "failed": 0, "csv_offset": 0}
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("fingerprint") != fingerprint:
+                raise SystemExit(f"Checkpoint {path} belongs to a different run; remove it or pass --restart")
+            self.state = saved
+        self.done = set(self.state["done"])
+
+    def record(self, index, images, failed, csv_offset=None):
+        self.done.add(index)
+        self.state["done"] = sorted(self.done)
+        self.state["images"] += images
+        self.state["failed"] += failed
+        if csv_offset is not None:
+            self.state["csv_offset"] = csv_offset
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+
+class Chunk(PipelineItem):
+    def __init__(self, index, entries):
+        super().__init__(None, f"chunk {index}", None)
+        self.index = index
+        self.entries = entries
+        self.pixels = None
+        self.decoded = []
+        self.failures = []
+        self.rows = []
+
+
+class CSVWriter:
+    def __init__(self, path, offset):
+        self.file = open(path, "r+" if offset and os.path.exists(path) else "w", newline="")
+        self.file.truncate(offset if offset else 0)  # Drop rows written after the last checkpoint
+        self.file.seek(0, os.SEEK_END)
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_COLUMNS)
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, chunk):
+        self.writer.writerows(chunk.rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, output_dir):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(chunk.rows, schema=pa.schema([
+            ("user_id", pa.int64()), ("image_name", pa.string()), ("predicted_class", pa.string()),
+            ("confidence", pa.float32()), ("timestamp", pa.timestamp("us")), ("model_version", pa.string()),
+        ]))
+        # One file per chunk, so rewriting a chunk on resume replaces it instead of duplicating it
+        path = os.path.join(self.output_dir, f"part-{chunk.index:06d}.parquet")
+        pq.write_table(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        pass
+
+
+def create_writer(args, checkpoint):
+    if args.output == "csv":
+        return CSVWriter(args.output_path, checkpoint.state["csv_offset"])
+    if args.output == "parquet":
+        return ParquetWriter(args.output_path)
+    return None
+
+
+async def run(args, entries, checkpoint):
+    if args.output == "db":
+        loaded = await database.get_loaded_chunks(checkpoint.state["fingerprint"])
+        if args.restart and loaded:
+            if not args.force_duplicate:
+                await database.engine.dispose()
+                raise SystemExit(
+                    f"{len(loaded)} chunks of this run are already in the database; restarting would insert and "
+                    "count them again. Resume without --restart, or pass --force-duplicate to load them twice"
+                )
+            logger.warning("Restarting with %s chunks already in the database; they will be loaded twice", len(loaded))
+            await database.clear_loaded_chunks(checkpoint.state["fingerprint"])
+            loaded = {}
+        # Chunks committed to the database but not to the checkpoint file before the last run stopped
+        for index, (images, failed) in loaded.items():
+            if index not in checkpoint.done:
+                logger.info("Chunk %s is already in the database, skipping it", index)
+                checkpoint.record(index, images, failed)
+
+    decode_pool = BoundedExecutor("reclassify-decode", kind="process", max_workers=args.decode_workers)
+    model = await asyncio.to_thread(load_backend, args.backend, args.model_path, args.inference_threads)
+    writer = create_writer(args, checkpoint)
+
+    async def decode(chunk):
+        paths = [path for path, _, _ in chunk.entries]
+        chunk.pixels, chunk.decoded, chunk.failures = await decode_pool.run(decode_files, paths, IMG_SIZE)
+
+    async def infer(chunk):
+        if not chunk.decoded:
+            return
+        def predict():
+            batch = chunk.pixels.astype(np.float32)
+            np.multiply(batch, 1.0 / 255.0, out=batch)  # Same scaling as preprocess_batch
+            return model.predict(batch)
+        predictions = await asyncio.to_thread(predict)
+        chunk.pixels = None
+        timestamp = datetime.utcnow()
+        for index, scores in zip(chunk.decoded, predictions):
+            _, image_name, user_id = chunk.entries[index]
+            predicted_class = int(np.argmax(scores))
+            chunk.rows.append({
+                "user_id": user_id,
+                "image_name": image_name,
+                "predicted_class": FEATURE_NAMES[predicted_class] if predicted_class < len(FEATURE_NAMES) else "Unknown",
+                "confidence": float(scores[predicted_class]),
+                "timestamp": timestamp,
+                "model_version": args.model_version,
+            })
+
+    async def write(chunk):
+        csv_offset = None
+        if args.output == "db":
+            await database.copy_classifications(chunk.rows, load_chunk={
+                "run_id": checkpoint.state["fingerprint"],
+                "chunk_index": chunk.index,
+                "images": len(chunk.rows),
+                "failed": len(chunk.failures),
+            })
+        elif args.output == "csv":
+            csv_offset = await asyncio.to_thread(writer.write, chunk)
+        else:
+            await asyncio.to_thread(writer.write, chunk)
+        for index, error in chunk.failures:
+            logger.warning("Skipped %s: %s", chunk.entries[index][0], error)
+        checkpoint.record(chunk.index, len(chunk.rows), len(chunk.failures), csv_offset)
+
+    pipeline = StagedPipeline("reclassify", [
+        PipelineStage("decode", decode, args.decode_workers, args.queue_size),
+        PipelineStage("inference", infer, 1, args.queue_size),
+        PipelineStage("write", write, 1, args.queue_size),
+    ])
+
+    pending = [
+        (index, start) for index, start in enumerate(range(0, len(entries), args.batch_size))
+        if index not in checkpoint.done
+    ]
+    chunks = (Chunk(index, entries[start:start + args.batch_size]) for index, start in pending)
+    remaining = sum(len(entries[start:start + args.batch_size]) for _, start in pending)
+    logger.info("%s images, %s left to classify in chunks of %s", len(entries), remaining, args.batch_size)
+
+    start = time.perf_counter()
+    last_report = start
+    processed = 0
+    failed_chunks = []
+    try:
+        async for chunk in pipeline.map(chunks):
+            if chunk.error is not None:
+                # The chunk stays out of the checkpoint and is retried by the next run
+                failed_chunks.append(chunk.index)
+                logger.error("Chunk %s failed in the %s stage: %s", chunk.index, chunk.stage, chunk.error)
+                continue
+            processed += len(chunk.entries)
+            now = time.perf_counter()
+            if now - last_report >= args.progress_seconds:
+                last_report = now
+                logger.info("%s/%s images, %.1f images/sec", processed, remaining, processed / (now - start))
+    finally:
+        stats = pipeline.stats()
+        await pipeline.stop()
+        decode_pool.shutdown()
+        if writer is not None:
+            writer.close()
+        await database.engine.dispose()
+    elapsed = time.perf_counter() - start
+    return {
+        "images": len(entries),
+        "processed": processed,
+        "classified_total": checkpoint.state["images"],
+        "undecodable_total": checkpoint.state["failed"],
+        "failed_chunks": failed_chunks,
+        "seconds": elapsed,
+        "images_per_second": processed / elapsed if elapsed else 0.0,
+        "stages": stats["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="Directory of images, walked recursively")
+    source.add_argument("--manifest", help="Text file of paths, or CSV with path[,user_id][,image_name] columns")
+    parser.add_argument("--output", choices=["db", "csv", "parquet"], default="csv")
+    parser.add_argument("--output-path", help="CSV file or Parquet directory (not used for db)")
+    parser.add_argument("--user-id", type=int, help="user_id for images without one in the manifest")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--model-version", default=None, help="Defaults to MODEL_VERSION, or the model directory name")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=INFERENCE_BACKEND)
+    parser.add_argument("--inference-threads", type=int, default=INFERENCE_BACKEND_THREADS)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=2, help="Chunks waiting in front of each stage")
+    parser.add_argument("--checkpoint", help="Defaults to <output-path>.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--force-duplicate", action="store_true",
+                        help="With --restart and db output, load chunks already in the database again")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--progress-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    configure_logging(log_format="text", log_file="")
+    if args.output != "db" and not args.output_path:
+        parser.error("--output-path is required for csv and parquet output")
+    if args.model_version is None:
+        args.model_version = MODEL_VERSION if args.model_path == MODEL_PATH else os.path.basename(args.model_path.rstrip("/"))
+    entries = list_directory(args.images, args.user_id) if args.images else read_manifest(args.manifest, args.user_id)
+    entries = entries[:args.limit or None]
+    if not entries:
+        raise SystemExit("No images to classify")
+    if args.output == "db" and any(user_id is None for _, _, user_id in entries):
+        parser.error("Database output needs a user_id for every image: pass --user-id or a user_id manifest column")
+
+    digest = hashlib.sha256(json.dumps([args.model_version, args.output, args.output_path, args.batch_size]).encode())
+    for entry in entries:
+        digest.update(json.dumps(entry).encode())
+    fingerprint = digest.hexdigest()
+    checkpoint_path = args.checkpoint or (
+        f"{args.output_path.rstrip('/')}.checkpoint.json" if args.output_path else f"reclassify-{args.model_version}.checkpoint.json"
+    )
+    checkpoint = Checkpoint(checkpoint_path, fingerprint, restart=args.restart)
+    summary = asyncio.run(run(args, entries, checkpoint))
+    summary["checkpoint"] = checkpoint_path
+    print(json.dumps(summary, indent=2))
+    if summary["failed_chunks"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
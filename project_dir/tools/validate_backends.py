@@ -0,0 +1,152 @@
+"""Export the burn classifier to faster backends and validate them against Keras.
+
+Each candidate (TFLite float16/int8, ONNX, ...) is exported from the Keras
+SavedModel, run over a held-out image set and compared with the Keras
+reference: top-class agreement, drift of the top-class confidence and of
+the full probability vector, and throughput. The report is printed as JSON
+and names the fastest candidate that stays within tolerance.
+
+Usage:
+    python tools/validate_backends.py --model /project_dir/models/final_burn_classifier_model_saved \\
+        --images /data/holdout --export-dir /project_dir/models/exported \\
+        --candidates tflite-float16,tflite-int8,onnx
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_service import preprocess_bytes, IMAGE_EXTENSIONS  # noqa: E402
+from services.inference_backends import load_backend, export_tflite, export_onnx  # noqa: E402
+
+CANDIDATES = {
+    "tflite-float32": ("tflite", "model_float32.tflite"),
+    "tflite-float16": ("tflite", "model_float16.tflite"),
+    "tflite-int8": ("tflite", "model_int8.tflite"),
+    "onnx": ("onnx", "model.onnx"),
+}
+
+
+def load_image_batches(image_dir, batch_size, limit, target_size):
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(image_dir)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit or None]
+    if not paths:
+        raise SystemExit(f"No images found under {image_dir}")
+    batches = []
+    for start in range(0, len(paths), batch_size):
+        contents = []
+        for path in paths[start:start + batch_size]:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        batches.append(preprocess_bytes(contents, target_size))
+    return batches
+
+
+def export_candidate(name, model_path, export_dir, calibration_batches):
+    kind, file_name = CANDIDATES[name]
+    output_path = os.path.join(export_dir, file_name)
+    if name == "onnx":
+        export_onnx(model_path, output_path)
+    else:
+        quantization = name.split("-", 1)[1]
+        export_tflite(model_path, output_path, quantization=quantization.replace("float32", "none"),
+                      representative_batches=calibration_batches)
+    return kind, output_path
+
+
+def run_backend(backend, batches):
+    backend.predict(batches[0][:1])  # warm-up
+    outputs = []
+    start = time.perf_counter()
+    for batch in batches:
+        outputs.append(np.asarray(backend.predict(batch), dtype=np.float32))
+    elapsed = time.perf_counter() - start
+    predictions = np.concatenate(outputs, axis=0)
+    return predictions, predictions.shape[0] / elapsed
+
+
+def compare(reference, candidate):
+    reference_class = reference.argmax(axis=-1)
+    candidate_class = candidate.argmax(axis=-1)
+    # Drift of the confidence the API would report, and of the whole probability vector
+    confidence_drift = np.abs(reference.max(axis=-1) - candidate.max(axis=-1))
+    probability_drift = np.abs(reference - candidate).max(axis=-1)
+    return {
+        "top_class_agreement": float((reference_class == candidate_class).mean()),
+        "confidence_drift_mean": float(confidence_drift.mean()),
+        "confidence_drift_max": float(confidence_drift.max()),
+        "probability_drift_max": float(probability_drift.max()),
+    }
+
+
+def main(args):
+    os.makedirs(args.export_dir, exist_ok=True)
+    batches = load_image_batches(args.images, args.batch_size, args.limit, (args.image_size, args.image_size))
+    calibration_batches = batches[:max(1, args.calibration_batches)]
+
+    reference_backend = load_backend("keras", args.model, num_threads=args.threads)
+    reference, reference_throughput = run_backend(reference_backend, batches)
+    report = {
+        "images": int(reference.shape[0]),
+        "tolerance": {"min_agreement": args.min_agreement, "max_confidence_drift": args.max_confidence_drift},
+        "keras": {"images_per_second": reference_throughput},
+        "candidates": {},
+    }
+    del reference_backend
+
+    for name in args.candidates:
+        if name not in CANDIDATES:
+            raise SystemExit(f"Unknown candidate {name}, expected one of {sorted(CANDIDATES)}")
+        kind, path = CANDIDATES[name][0], os.path.join(args.export_dir, CANDIDATES[name][1])
+        try:
+            if not (args.skip_export and os.path.exists(path)):
+                kind, path = export_candidate(name, args.model, args.export_dir, calibration_batches)
+            predictions, throughput = run_backend(load_backend(kind, path, num_threads=args.threads), batches)
+        except Exception as e:
+            report["candidates"][name] = {"error": str(e), "within_tolerance": False}
+            continue
+        result = compare(reference, predictions)
+        result.update(
+            path=path,
+            size_bytes=os.path.getsize(path),
+            images_per_second=throughput,
+            speedup=throughput / reference_throughput,
+            within_tolerance=(result["top_class_agreement"] >= args.min_agreement
+                              and result["confidence_drift_max"] <= args.max_confidence_drift),
+        )
+        report["candidates"][name] = result
+
+    passing = [(result["images_per_second"], name) for name, result in report["candidates"].items()
+               if result.get("within_tolerance")]
+    report["recommended"] = max(passing)[1] if passing else "keras"
+    print(json.dumps(report, indent=2))
+
+
+def name_list(value):
+    return [item for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv('MODEL_PATH', '/project_dir/models/final_burn_classifier_model_saved'),
+                        help="Keras SavedModel used as the reference")
+    parser.add_argument("--images", required=True, help="Directory of held-out images")
+    parser.add_argument("--export-dir", default="exported_models")
+    parser.add_argument("--candidates", type=name_list, default=["tflite-float16", "tflite-int8", "onnx"])
+    parser.add_argument("--skip-export", action="store_true", help="Reuse previously exported files")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many images (0 = all)")
+    parser.add_argument("--calibration-batches", type=int, default=8, help="Batches used for int8 calibration")
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--max-confidence-drift", type=float, default=0.05)
+    main(parser.parse_args())